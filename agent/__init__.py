@@ -1,2 +1,13 @@
-from agent.main import *
-from agent.bargain import start_action
+import importlib
+
+
+def __getattr__(name: str):
+    # agent.main builds the agents and runners, so it is only imported when
+    # one of its names is used, not by every import of a submodule
+    if name == "start_action":
+        from agent.bargain import start_action
+
+        return start_action
+    if name.startswith("__"):
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module("agent.main"), name)
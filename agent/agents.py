@@ -1,67 +1,71 @@
 from google.adk.agents import Agent, SequentialAgent
 from google.adk.runners import Runner
 
+from agent.prefetch import inject_prefetched_context
 from agent.prompts import prompts
 from agent.tools import *
+from agent.tools import async_passes
 
 from utility.config import configurations
 
 
 AGENT_MODEL = configurations["agent"]["model"]
 
-# Define the agents as before
-output_agent = Agent(
-    model=AGENT_MODEL,
-    name="output_agent",
-    description=prompts["output_agent"]["description"],
-    instruction=prompts["output_agent"]["instruction"],
-    tools=[],
-)
-
-add_relevency_agent = Agent(
-    model=AGENT_MODEL,
-    name="add_relevency_agent",
-    description=prompts["add_relevency_agent"]["description"],
-    instruction=prompts["add_relevency_agent"]["instruction"],
-    tools=[put_relevent_data],
-    sub_agents=[output_agent],
-)
-
-pass_agent = Agent(
-    model=AGENT_MODEL,
-    name="pass_agent",
-    description=prompts["pass_agent"]["description"],
-    instruction=prompts["pass_agent"]["instruction"],
-    tools=[
-        insert_pass_object_string,
-        update_pass_object_string,
-    ],
-    output_key="passes_generated",
-    sub_agents=[add_relevency_agent],
-)
-
-
-get_relevency_agent = Agent(
-    model=AGENT_MODEL,
-    name="get_relevency_agent",
-    description=prompts["get_relevency_agent"]["description"],
-    instruction=prompts["get_relevency_agent"]["instruction"],
-    tools=[get_relevant_context],
-    sub_agents=[],
-)
-
-extraction_agent = Agent(
-    model=AGENT_MODEL,
-    name="extraction_agent",
-    description=prompts["extraction_agent"]["description"],
-    instruction=prompts["extraction_agent"]["instruction"],
-    tools=[],
-    output_key="extracted_content",
-    sub_agents=[get_relevency_agent],
-    # tools=[add_reciept_data, delete_reciept_data],
-)
-
-root_agent = extraction_agent
+# Agents of the receipt pipeline, each one transfers to the next agent of its chain
+AGENT_SPECS = {
+    "extraction_agent": {
+        "tools": [add_reciept_data, delete_reciept_data],
+        "output_key": "extracted_content",
+    },
+    "get_relevency_agent": {
+        # text-only messages skip extraction_agent, so receipt deletes are handled here too
+        "tools": [get_relevant_context, get_spend_summary, delete_reciept_data],
+        "output_key": "chat_response",
+        "before_agent_callback": inject_prefetched_context,
+    },
+    "pass_agent": {
+        "tools": [
+            async_passes.insert_pass_object_string,
+            async_passes.insert_pass_objects,
+            async_passes.update_pass_object_string,
+            add_reminder_data,
+            update_reminder_data,
+            delete_remainder_data,
+        ],
+        "output_key": "passes_generated",
+    },
+    "add_relevency_agent": {"tools": [put_relevent_data]},
+}
+
+STAGE_ONE_CHAIN = ("extraction_agent", "get_relevency_agent")
+STAGE_TWO_CHAIN = ("pass_agent", "add_relevency_agent")
+
+
+def build_agent(name: str, sub_agents: list | None = None) -> Agent:
+    return Agent(
+        model=AGENT_MODEL,
+        name=name,
+        description=prompts[name]["description"],
+        instruction=prompts[name]["instruction"],
+        sub_agents=sub_agents or [],
+        **AGENT_SPECS[name],
+    )
+
+
+def build_chain(names) -> Agent:
+    """
+    Builds fresh agents for `names`, each one the only sub agent of the previous,
+    and returns the first. An ADK agent can only have one parent, so every chain
+    gets its own instances.
+    """
+    agent = None
+    for name in reversed(names):
+        agent = build_agent(name, [agent] if agent else [])
+    return agent
+
+
+root_agent = build_chain(STAGE_ONE_CHAIN)
+pass_agent = build_chain(STAGE_TWO_CHAIN)
 
 
 # relevancy_agent = Agent(
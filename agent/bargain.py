@@ -1,17 +1,73 @@
+import asyncio
+import uuid
+
 from google.adk.agents import Agent
+from google.adk.agents.run_config import RunConfig, StreamingMode
 from google.adk.runners import Runner
 from google.adk.sessions import InMemorySessionService
 from google.genai import types
 
-from agent.tools import *
+from agent.negotiation import NegotiationController
+from agent.strategies import NegotiationTerms, negotiate
+from agent.tools import async_bargain
 
 from utility.config import configurations
 
 APP_NAME = "bargain"
 AGENT_MODEL = configurations["agent"]["model"]
 
+# number of most recent session contents sent verbatim to the model,
+# anything older is condensed into a rolling summary
+HISTORY_WINDOW = configurations["agent"].get("bargain_history_window", 8)
+SUMMARY_CHARS_PER_TURN = 160
+SUMMARY_MAX_CHARS = 2000
+
+# bounds on every negotiation, see NegotiationController
+MAX_TURNS = configurations["agent"].get("bargain_max_turns", 12)
+TIME_BUDGET = configurations["agent"].get("bargain_time_budget", 120.0)
+PRICE_TOLERANCE = configurations["agent"].get("bargain_price_tolerance", 0.02)
+
+
+def _content_text(content) -> str:
+    return " ".join(part.text for part in content.parts or [] if part.text).strip()
+
+
+def condense_history(callback_context, llm_request):
+    """
+    before_model_callback that keeps only the last HISTORY_WINDOW contents of
+    the session and replaces older turns with a short rolling summary.
+    """
+    contents = llm_request.contents
+    if len(contents) <= HISTORY_WINDOW:
+        return None
+    cut = len(contents) - HISTORY_WINDOW
+    # never separate a tool response from the call that produced it
+    while cut < len(contents) and any(
+        part.function_response for part in contents[cut].parts or []
+    ):
+        cut += 1
+    summary = []
+    for content in contents[:cut]:
+        text = _content_text(content)
+        if text:
+            summary.append(f"{content.role}: {text[:SUMMARY_CHARS_PER_TURN]}")
+    llm_request.contents = [
+        types.Content(
+            role="user",
+            parts=[
+                types.Part.from_text(
+                    text="summary of the earlier negotiation:\n"
+                    + "\n".join(summary)[-SUMMARY_MAX_CHARS:]
+                )
+            ],
+        )
+    ] + contents[cut:]
+    return None
+
+
 session_merchant = InMemorySessionService()
 session_customer = InMemorySessionService()
+session_narrator = InMemorySessionService()
 
 agent_customer = Agent(
     model=AGENT_MODEL,
@@ -23,10 +79,16 @@ agent_customer = Agent(
         first get your balance using your 'get_balance' tool
         You must argue with the merchant to buy item and reach an equillibrium state
         use the corresponding tools to do the actions
+        use 'buy_items_from_seller' when buying several products from the merchant at once
         your output are texts like chatting
         send the output as 'break' if the bargain failed, or else the merchant sold the product
     """,
-    tools=[get_balance, buy_item_from_seller],
+    before_model_callback=condense_history,
+    tools=[
+        async_bargain.get_balance,
+        async_bargain.buy_item_from_seller,
+        async_bargain.buy_items_from_seller,
+    ],
 )
 agent_merchant = Agent(
     model=AGENT_MODEL,
@@ -41,7 +103,20 @@ agent_merchant = Agent(
         send a google waller passes object like this after the buying is made
         send the output as 'break' if the bargain failed
     """,
-    tools=[get_inventory],
+    before_model_callback=condense_history,
+    tools=[async_bargain.get_inventory],
+)
+
+agent_narrator = Agent(
+    model=AGENT_MODEL,
+    name="narrator_agent",
+    description="A agent that phrases an already decided negotiation as a chat",
+    instruction="""
+        You are given the offers of a negotiation between a merchant and a customer, one per line
+        The prices and the outcome are already decided, do not change any number
+        rewrite every line as a short natural chat message of the same party
+        output exactly one message per input line, in the same order, without the party prefix
+    """,
 )
 
 
@@ -55,6 +130,19 @@ runner_customer = Runner(
     session_service=session_customer,
     app_name=APP_NAME,
 )
+runner_narrator = Runner(
+    agent=agent_narrator,
+    session_service=session_narrator,
+    app_name=APP_NAME,
+)
+
+# runners hold no per-conversation state, so one runner per role is reused
+# by every negotiation; isolation comes from the per-negotiation session ids
+runner_pool = {
+    "seller": runner_merchant,
+    "customer": runner_customer,
+    "narrator": runner_narrator,
+}
 
 
 async def asset_session_existence(runner, session_id: str | None, user_id: str):
@@ -72,20 +160,33 @@ async def asset_session_existence(runner, session_id: str | None, user_id: str):
         return await runner.session_service.create_session(
             app_name=APP_NAME,
             user_id=user_id,
+            session_id=session_id,
         )
 
 
-async def call_agent_async(content, runner, user_id, session_id):
+async def stream_agent_turn(content, runner, user_id, session_id, run_config=None):
+    """
+    Sends one turn to the agent. Yields {"type": "delta"} events with partial text
+    when run_config enables streaming, then one {"type": "final"} event with the
+    final response and token usage.
+    """
     final_response_text = "Agent did not produce a final response."
+    usage = {"prompt_tokens": 0, "response_tokens": 0}
     query = types.Content(role="user", parts=content)
 
     session = await asset_session_existence(runner, session_id, user_id)
     async for event in runner.run_async(
-        user_id=user_id, session_id=session.id, new_message=query
+        user_id=user_id, session_id=session.id, new_message=query, run_config=run_config
     ):
-        print(
-            f"  [Event] Author: {event.author}, Type: {type(event).__name__}, Final: {event.is_final_response()}, Content: {event.content}"
-        )
+        if event.partial:
+            if event.content and event.content.parts and event.content.parts[0].text:
+                yield {"type": "delta", "text": event.content.parts[0].text}
+            continue
+        if event.usage_metadata:
+            usage["prompt_tokens"] += event.usage_metadata.prompt_token_count or 0
+            usage["response_tokens"] += (
+                event.usage_metadata.candidates_token_count or 0
+            )
         if event.is_final_response():
             if event.content and event.content.parts:
                 final_response_text = event.content.parts[0].text
@@ -96,46 +197,211 @@ async def call_agent_async(content, runner, user_id, session_id):
                     f"Agent escalated: {event.error_message or 'No specific message.'}"
                 )
             break  # Stop processing events once the final response is found
-    return final_response_text
+    yield {"type": "final", "text": final_response_text, "usage": usage}
 
 
-async def start_action(cust_id, seller_id, product_id):
-    parts_list = [
-        types.Part.from_text(
-            text=f"this is message from {cust_id} to get {product_id} for the seller {seller_id}"
-        )
-    ]
-    chatHistory = (
-        "customer::"
-        + f"this is message from {cust_id} to get {product_id} for the seller {seller_id}"
+async def call_agent_async(content, runner, user_id, session_id):
+    """Sends one turn to the agent and returns its final response with token usage."""
+    async for event in stream_agent_turn(content, runner, user_id, session_id):
+        if event["type"] == "final":
+            return event["text"], event["usage"]
+
+
+async def stream_action(
+    cust_id,
+    seller_id,
+    product_id,
+    negotiation_id=None,
+    controller=None,
+    stream_tokens=True,
+):
+    """
+    Runs a negotiation and yields every turn as soon as it is produced:
+    {"type": "delta"} events carry partial text of the current turn when
+    stream_tokens is set, {"type": "turn"} events carry each finished turn and
+    a last {"type": "end"} event carries the stop reason and agreed price.
+    """
+    # every negotiation gets its own sessions, so concurrent bargains never
+    # share history; each agent keeps the negotiation in its session and only
+    # the latest message of the other party is sent on every turn
+    negotiation_id = negotiation_id or uuid.uuid4().hex
+    controller = controller or NegotiationController(
+        max_turns=MAX_TURNS, time_budget=TIME_BUDGET, tolerance=PRICE_TOLERANCE
     )
-    output = await call_agent_async(parts_list, runner_merchant, "merch1", "ses1")
-    turn = 0
-    output_list = [{"user_type": "customer", "response": output}]
-    while output != "break":
-        if turn == 0:
-            parts_list = [
-                types.Part.from_text(text="below is chat history:" + chatHistory),
-                types.Part.from_text(
-                    text=f"this is message from {seller_id} to sell {product_id} for the customer {cust_id}:{output}"
-                ),
-            ]
-            output = await call_agent_async(
-                parts_list, runner_customer, "cust1", "ses1"
+    run_config = RunConfig(streaming_mode=StreamingMode.SSE) if stream_tokens else None
+    parties = {
+        "seller": (runner_pool["seller"], seller_id),
+        "customer": (runner_pool["customer"], cust_id),
+    }
+    message = (
+        f"this is message from {cust_id} to get {product_id} for the seller {seller_id}"
+    )
+    try:
+        while controller.can_continue():
+            user_type = "seller" if controller.turns % 2 == 0 else "customer"
+            runner, user_id = parties[user_type]
+            turn_stream = stream_agent_turn(
+                [types.Part.from_text(text=message)],
+                runner,
+                user_id,
+                negotiation_id,
+                run_config,
             )
-            output_list.append({"user_type": "seller", "response": output})
-            chatHistory += "seller:" + output
-        else:
-            parts_list = [
-                types.Part.from_text(text="below is chat history:" + chatHistory),
-                types.Part.from_text(
-                    text=f"this is message from {cust_id} to buy {product_id} from the seller {seller_id}:{output}"
-                ),
-            ]
-            output = await call_agent_async(
-                parts_list, runner_customer, "cust1", "ses1"
+            try:
+                while True:
+                    event = await asyncio.wait_for(
+                        anext(turn_stream), timeout=controller.remaining_time()
+                    )
+                    if event["type"] == "final":
+                        break
+                    yield {
+                        "type": "delta",
+                        "negotiation_id": negotiation_id,
+                        "user_type": user_type,
+                        "text": event["text"],
+                    }
+            except asyncio.TimeoutError:
+                controller.stop_reason = "time_budget"
+                break
+            finally:
+                await turn_stream.aclose()
+            output, usage = event["text"], event["usage"]
+            price = controller.record(user_type, output)
+            entry = {"user_type": user_type, "response": output, "price": price, **usage}
+            yield {"type": "turn", "negotiation_id": negotiation_id, "turn": entry}
+            if user_type == "seller":
+                message = f"this is message from {seller_id} to sell {product_id} for the customer {cust_id}:{output}"
+            else:
+                message = f"this is message from {cust_id} to buy {product_id} from the seller {seller_id}:{output}"
+            print(
+                f"  [{negotiation_id} turn {controller.turns}] {user_type}: price={price}, prompt_tokens={usage['prompt_tokens']}, response_tokens={usage['response_tokens']}"
             )
-            output_list.append({"user_type": "customer", "response": output})
-            chatHistory += "customer:" + output
+    finally:
+        for runner, user_id in parties.values():
+            await runner.session_service.delete_session(
+                app_name=APP_NAME, user_id=user_id, session_id=negotiation_id
+            )
+
+    yield {
+        "type": "end",
+        "negotiation_id": negotiation_id,
+        "turn": {
+            "user_type": "system",
+            "response": f"negotiation ended: {controller.stop_reason}",
+            "price": controller.agreed_price(),
+        },
+    }
 
+
+async def start_action(
+    cust_id, seller_id, product_id, negotiation_id=None, controller=None
+):
+    output_list = []
+    async for event in stream_action(
+        cust_id, seller_id, product_id, negotiation_id, controller, stream_tokens=False
+    ):
+        if event["type"] != "delta":
+            output_list.append(event["turn"])
     return output_list
+
+
+ENGINE_MESSAGES = {
+    "seller": "I can sell it for ${:.2f}.",
+    "buyer": "I can pay ${:.2f}.",
+}
+
+
+def _engine_transcript(outcome) -> list:
+    return [
+        {
+            "user_type": "seller" if offer.party == "seller" else "customer",
+            "response": ENGINE_MESSAGES[offer.party].format(offer.price),
+            "price": offer.price,
+        }
+        for offer in outcome.offers
+    ]
+
+
+async def narrate(output_list: list, negotiation_id: str) -> list:
+    """Rephrases an engine transcript with a single model call, keeping the prices."""
+    lines = "\n".join(f"{turn['user_type']}: {turn['response']}" for turn in output_list)
+    runner = runner_pool["narrator"]
+    try:
+        text, usage = await call_agent_async(
+            [types.Part.from_text(text=lines)], runner, "narrator", negotiation_id
+        )
+    finally:
+        await runner.session_service.delete_session(
+            app_name=APP_NAME, user_id="narrator", session_id=negotiation_id
+        )
+    messages = [line.strip() for line in text.splitlines() if line.strip()]
+    if len(messages) != len(output_list):
+        # keep the templated transcript rather than mismatching turns
+        return output_list
+    return [
+        {**turn, "response": message} for turn, message in zip(output_list, messages)
+    ]
+
+
+async def start_engine_action(
+    cust_id,
+    seller_id,
+    product_id,
+    buyer_limit: float,
+    merchant_limit: float,
+    list_price: float | None = None,
+    strategy: str = "alternating",
+    narrate_transcript: bool = True,
+):
+    """
+    Negotiates with a deterministic strategy from agent.strategies instead of one
+    model call per turn. With narrate_transcript the finished transcript is phrased
+    by a single model call, without it no model is called at all, which is the mode
+    for bulk or automated purchases.
+    """
+    if list_price is None:
+        list_price = await async_bargain.get_item_cost(seller_id, product_id)
+    outcome = negotiate(
+        NegotiationTerms.from_limits(list_price, buyer_limit, merchant_limit), strategy
+    )
+    output_list = _engine_transcript(outcome)
+    if narrate_transcript and output_list:
+        output_list = await narrate(output_list, uuid.uuid4().hex)
+    output_list.append(
+        {
+            "user_type": "system",
+            "response": f"negotiation ended: {'agreed' if outcome.agreed else 'no_deal'}",
+            "price": outcome.price,
+        }
+    )
+    return output_list
+
+
+class NegotiationScheduler:
+    """
+    Runs many negotiations concurrently in one event loop, with at most
+    max_concurrency of them talking to the model at the same time.
+    """
+
+    def __init__(self, max_concurrency: int = 100):
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run_one(self, cust_id, seller_id, product_id, negotiation_id=None):
+        async with self.semaphore:
+            return await start_action(cust_id, seller_id, product_id, negotiation_id)
+
+    def submit(self, cust_id, seller_id, product_id, negotiation_id=None):
+        """Schedules a negotiation and returns its asyncio task."""
+        return asyncio.create_task(
+            self.run_one(cust_id, seller_id, product_id, negotiation_id)
+        )
+
+    async def run_all(self, negotiations: list) -> list:
+        """
+        Runs (cust_id, seller_id, product_id) negotiations and returns their
+        results in order; a failed negotiation yields its exception instead.
+        """
+        return await asyncio.gather(
+            *(self.run_one(*negotiation) for negotiation in negotiations),
+            return_exceptions=True,
+        )
@@ -0,0 +1,61 @@
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+# sha256 hex digest of one image; only byte-identical images share an
+# extraction, receipts of one store photographed alike are too close for
+# perceptual hashes to tell apart
+Fingerprint = str
+
+
+class ExtractionCache:
+    """
+    Per-user cache of receipt extraction results, addressed by the content of
+    the images they were extracted from. Each user keeps at most
+    `max_entries` results in LRU order and a result expires after `ttl` seconds.
+    At most `max_users` users are kept, the least recently active is dropped first.
+    """
+
+    def __init__(self, max_entries: int = 32, ttl: float = 7 * 24 * 3600, max_users: int = 1024):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_users = max_users
+        self.entries: "OrderedDict[str, OrderedDict[Tuple[Fingerprint, ...], tuple]]" = OrderedDict()
+
+    def lookup(self, user_id: str, fingerprints: List[Fingerprint]) -> Optional[str]:
+        """
+        Finds an earlier extraction of the same images.
+        Args:
+            user_id (str): The ID of the user.
+            fingerprints (List[Fingerprint]): Fingerprints of the images, in message order.
+        Returns:
+            Optional[str]: The cached extracted content, None on a miss.
+        """
+        user_entries = self.entries.get(user_id)
+        if not user_entries or not fingerprints:
+            return None
+        self.entries.move_to_end(user_id)
+        key = tuple(fingerprints)
+        entry = user_entries.get(key)
+        if entry is None:
+            return None
+        stored_at, extracted = entry
+        if time.monotonic() - stored_at > self.ttl:
+            del user_entries[key]
+            return None
+        user_entries.move_to_end(key)
+        return extracted
+
+    def store(self, user_id: str, fingerprints: List[Fingerprint], extracted: str):
+        user_entries = self.entries.setdefault(user_id, OrderedDict())
+        self.entries.move_to_end(user_id)
+        while len(self.entries) > self.max_users:
+            self.entries.popitem(last=False)
+        key = tuple(fingerprints)
+        user_entries[key] = (time.monotonic(), extracted)
+        user_entries.move_to_end(key)
+        while len(user_entries) > self.max_entries:
+            user_entries.popitem(last=False)
+
+
+extraction_cache = ExtractionCache()
@@ -0,0 +1,97 @@
+import json
+from typing import Any, Dict, List
+
+# state keys written by the pipeline agents through their output_key
+STAGE_OUTPUT_KEYS = ("extracted_content", "passes_generated")
+DIGEST_MAX_BYTES = 4096
+
+
+# lists and dicts keep at most this many items before shortening further
+DIGEST_MAX_ITEMS = 64
+
+
+def _shorten(value: Any, limit: int, max_items: int = DIGEST_MAX_ITEMS) -> Any:
+    """Cuts strings to `limit` characters and lists and dicts to `max_items` items."""
+    if isinstance(value, str):
+        return value if len(value) <= limit else value[:limit] + "..."
+    if isinstance(value, dict):
+        return {
+            key: _shorten(item, limit, max_items)
+            for key, item in list(value.items())[:max_items]
+        }
+    if isinstance(value, list):
+        return [_shorten(item, limit, max_items) for item in value[:max_items]]
+    return value
+
+
+class StageDigest:
+    """
+    Compact summary of what one runner stage produced: the output_key values
+    its agents wrote, the results of the tools they called and the final text.
+    It replaces the repr dump of every event as the hand-off to the next stage.
+    """
+
+    def __init__(self, max_bytes: int = DIGEST_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.extracted: Dict[str, Any] = {}
+        self.tool_results: List[Dict[str, Any]] = []
+        self.final_text = ""
+        self.size_bytes = 0
+
+    def add_event(self, event):
+        state_delta = (event.actions.state_delta or {}) if event.actions else {}
+        for key in STAGE_OUTPUT_KEYS:
+            if key in state_delta:
+                self.extracted[key] = state_delta[key]
+        for response in event.get_function_responses():
+            self.tool_results.append({"tool": response.name, "result": response.response})
+
+    def to_dict(self) -> dict:
+        return {
+            "extracted": self.extracted,
+            "tool_results": self.tool_results,
+            "final_text": self.final_text,
+        }
+
+    def _fits(self, text: str) -> bool:
+        return len(text.encode("utf-8")) <= self.max_bytes
+
+    def _shortened(self, limit: int, max_items: int) -> dict:
+        # the top level keys and the extracted keys are always kept, only their values shrink
+        return {
+            "extracted": {
+                key: _shorten(value, limit, max_items) for key, value in self.extracted.items()
+            },
+            "tool_results": [
+                _shorten(result, limit, max_items) for result in self.tool_results
+            ],
+            "final_text": _shorten(self.final_text, limit, max_items),
+        }
+
+    def to_text(self) -> str:
+        """
+        Serializes the digest, shortening long values until it fits max_bytes.
+        When shortening is not enough the oldest tool results are dropped, then
+        the final text, then the extracted values, so the result is always
+        valid JSON with every top level key.
+        """
+        digest = self.to_dict()
+        limit, max_items = 2048, DIGEST_MAX_ITEMS
+        text = json.dumps(digest, default=str)
+        while not self._fits(text) and limit > 32:
+            limit //= 2
+            max_items = max(max_items // 2, 1)
+            digest = self._shortened(limit, max_items)
+            text = json.dumps(digest, default=str)
+        while not self._fits(text) and digest.get("tool_results"):
+            digest["tool_results"].pop(0)
+            digest["truncated"] = True
+            text = json.dumps(digest, default=str)
+        if not self._fits(text):
+            digest.update(final_text="", truncated=True)
+            text = json.dumps(digest, default=str)
+        if not self._fits(text):
+            digest["extracted"] = {key: "..." for key in digest.get("extracted", {})}
+            text = json.dumps(digest, default=str)
+        self.size_bytes = len(text.encode("utf-8"))
+        return text
@@ -0,0 +1,88 @@
+import asyncio
+import hashlib
+import io
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, NamedTuple
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # images are then sent as they are
+    Image = None
+    print("  [Images] Pillow is not installed, receipt images are sent without downscaling")
+
+# receipts stay readable well below phone camera resolution
+MAX_IMAGE_SIDE = 1600
+JPEG_QUALITY = 80
+
+image_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="receipt-image")
+
+MAGIC_NUMBERS = (
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+    (b"BM", "image/bmp"),
+)
+
+
+class ProcessedImage(NamedTuple):
+    data: bytes
+    mime_type: str
+    original_size: int
+    sha256: str
+
+
+def detect_mime_type(data: bytes) -> str:
+    """
+    Detects the real format of an image from its leading bytes.
+    Args:
+        data (bytes): The raw image.
+    Returns:
+        str: The mime type, "image/png" if it is not recognised, as the model
+            rejects generic binary types.
+    """
+    for magic, mime_type in MAGIC_NUMBERS:
+        if data.startswith(magic):
+            return mime_type
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    if data[4:12] in (b"ftypheic", b"ftypheix", b"ftypmif1", b"ftypmsf1"):
+        return "image/heic"
+    return "image/png"
+
+
+def preprocess_image(data: bytes) -> ProcessedImage:
+    """
+    Downscales a receipt image to MAX_IMAGE_SIDE, converts it to grayscale and
+    recompresses it as JPEG. The original is kept when it cannot be decoded or
+    when it is already smaller.
+    Args:
+        data (bytes): The raw image.
+    Returns:
+        ProcessedImage: The bytes to upload, their mime type, the original size
+            and the sha256 of the original.
+    """
+    original = ProcessedImage(
+        data, detect_mime_type(data), len(data), hashlib.sha256(data).hexdigest()
+    )
+    if Image is None:
+        return original
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image = ImageOps.exif_transpose(image).convert("L")
+            image.thumbnail((MAX_IMAGE_SIDE, MAX_IMAGE_SIDE))
+            output = io.BytesIO()
+            image.save(output, format="JPEG", quality=JPEG_QUALITY, optimize=True)
+    except Exception as e:
+        return original
+    if output.tell() >= len(data):
+        return original
+    return original._replace(data=output.getvalue(), mime_type="image/jpeg")
+
+
+async def preprocess_images(images: List[bytes]) -> List[ProcessedImage]:
+    """Preprocesses several images in parallel on the image thread pool."""
+    loop = asyncio.get_running_loop()
+    return await asyncio.gather(
+        *(loop.run_in_executor(image_pool, preprocess_image, data) for data in images)
+    )
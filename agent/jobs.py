@@ -0,0 +1,263 @@
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from typing import Awaitable, Callable, Dict, Optional
+
+JOBS_DB_PATH = "data/jobs.db"
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class JobQueue:
+    """
+    Durable background job queue backed by SQLite.
+
+    Jobs survive restarts: anything left running by a crashed worker is picked
+    up again on start. A failing job is retried with exponential backoff until
+    max_attempts, then marked failed. Handlers are registered per job kind and
+    receive the JSON payload the job was enqueued with. Jobs enqueued with a
+    dedupe key coalesce: while one is pending, enqueuing the same kind and key
+    again only replaces its payload.
+    """
+
+    def __init__(
+        self,
+        db_path: str = JOBS_DB_PATH,
+        max_attempts: int = 5,
+        base_delay: float = 2.0,
+        max_delay: float = 300.0,
+    ):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.handlers: Dict[str, Callable[[dict], Awaitable[Optional[dict]]]] = {}
+        self.failure_handlers: Dict[str, Callable[[dict, str], Awaitable[None]]] = {}
+        self.lock = threading.Lock()
+        self.wakeup = None
+        # running job tasks, referenced so they are not garbage collected
+        self.tasks = set()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                dedupe_key TEXT,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_run_at REAL NOT NULL,
+                result TEXT,
+                last_error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(jobs)")}
+        if "dedupe_key" not in columns:
+            self.conn.execute("ALTER TABLE jobs ADD COLUMN dedupe_key TEXT")
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS jobs_due ON jobs (status, next_run_at)"
+        )
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS jobs_dedupe ON jobs (kind, dedupe_key, status)"
+        )
+        self.conn.commit()
+
+    def register(
+        self,
+        kind: str,
+        handler: Callable[[dict], Awaitable[Optional[dict]]],
+        on_failure: Optional[Callable[[dict, str], Awaitable[None]]] = None,
+    ):
+        """
+        Registers the handler of a job kind.
+        Args:
+            kind (str): The job kind.
+            handler: Coroutine run with the payload of each job.
+            on_failure: Coroutine run with the payload and last error once a
+                job has used up all its attempts.
+        """
+        self.handlers[kind] = handler
+        if on_failure:
+            self.failure_handlers[kind] = on_failure
+
+    def enqueue(
+        self, kind: str, payload: dict, delay: float = 0.0, dedupe_key: Optional[str] = None
+    ) -> str:
+        """
+        Adds a job and returns its ID.
+        Args:
+            kind (str): The registered handler to run.
+            payload (dict): JSON serializable arguments of the job.
+            delay (float): Seconds to wait before the first attempt.
+            dedupe_key (Optional[str]): Coalesces with a pending job of the same
+                kind and key, which then runs with this payload.
+        Returns:
+            str: The ID of the job, used for status lookup.
+        """
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self.lock:
+            pending = None
+            if dedupe_key is not None:
+                pending = self.conn.execute(
+                    "SELECT id FROM jobs WHERE kind = ? AND dedupe_key = ? AND status = ?",
+                    (kind, dedupe_key, PENDING),
+                ).fetchone()
+            if pending:
+                job_id = pending[0]
+                self.conn.execute(
+                    "UPDATE jobs SET payload = ?, updated_at = ? WHERE id = ?",
+                    (json.dumps(payload), now, job_id),
+                )
+            else:
+                self.conn.execute(
+                    "INSERT INTO jobs"
+                    " (id, kind, payload, dedupe_key, status, next_run_at, created_at, updated_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (job_id, kind, json.dumps(payload), dedupe_key, PENDING, now + delay, now, now),
+                )
+            self.conn.commit()
+        if self.wakeup:
+            self.wakeup.set()
+        return job_id
+
+    def get_status(self, job_id: str) -> Optional[dict]:
+        """Returns the status, attempts, result and last error of a job, None if unknown."""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT id, kind, status, attempts, result, last_error, updated_at"
+                " FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "job_id": row[0],
+            "kind": row[1],
+            "status": row[2],
+            "attempts": row[3],
+            "result": json.loads(row[4]) if row[4] else None,
+            "last_error": row[5],
+            "updated_at": row[6],
+        }
+
+    def _claim_due(self):
+        now = time.time()
+        with self.lock:
+            # a job waits while another one with its dedupe key runs, so they finish in order
+            row = self.conn.execute(
+                "SELECT id, kind, payload, attempts FROM jobs AS job"
+                " WHERE status = ? AND next_run_at <= ? AND (dedupe_key IS NULL OR NOT EXISTS ("
+                "SELECT 1 FROM jobs WHERE kind = job.kind AND dedupe_key = job.dedupe_key"
+                " AND status = ?)) ORDER BY next_run_at LIMIT 1",
+                (PENDING, now, RUNNING),
+            ).fetchone()
+            if row is None:
+                return None
+            self.conn.execute(
+                "UPDATE jobs SET status = ?, attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                (RUNNING, now, row[0]),
+            )
+            self.conn.commit()
+        return row[0], row[1], row[2], row[3] + 1
+
+    def _next_due_in(self) -> Optional[float]:
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT MIN(next_run_at) FROM jobs WHERE status = ?", (PENDING,)
+            ).fetchone()
+        return None if row[0] is None else max(row[0] - time.time(), 0.0)
+
+    def _finish(self, job_id: str, result: Optional[dict]):
+        with self.lock:
+            self.conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, last_error = NULL, updated_at = ? WHERE id = ?",
+                (DONE, json.dumps(result, default=str), time.time(), job_id),
+            )
+            self.conn.commit()
+
+    def _fail(self, job_id: str, attempts: int, error: str) -> str:
+        now = time.time()
+        if attempts >= self.max_attempts:
+            status, next_run_at = FAILED, now
+        else:
+            delay = min(self.base_delay * 2 ** (attempts - 1), self.max_delay)
+            status, next_run_at = PENDING, now + delay
+        with self.lock:
+            self.conn.execute(
+                "UPDATE jobs SET status = ?, next_run_at = ?, last_error = ?, updated_at = ? WHERE id = ?",
+                (status, next_run_at, error, now, job_id),
+            )
+            self.conn.commit()
+        return status
+
+    async def run_job(self, job_id: str, kind: str, payload: str, attempts: int):
+        try:
+            result = await self.handlers[kind](json.loads(payload))
+        except Exception as e:
+            print(f"  [Job] {kind} {job_id} attempt {attempts} failed: {e}")
+            status = self._fail(job_id, attempts, traceback.format_exc(limit=5))
+            if status == FAILED and kind in self.failure_handlers:
+                try:
+                    await self.failure_handlers[kind](json.loads(payload), str(e))
+                except Exception as handler_error:
+                    print(f"  [Job] {kind} {job_id} failure handler failed: {handler_error}")
+            # let the worker recompute when the retry is due
+            self.wakeup.set()
+        else:
+            self._finish(job_id, result)
+
+    async def run_worker(self, concurrency: int = 4, poll_interval: float = 5.0):
+        """Runs due jobs forever, at most `concurrency` at a time."""
+        self.wakeup = asyncio.Event()
+        # jobs left running by a previous process are retried
+        with self.lock:
+            self.conn.execute(
+                "UPDATE jobs SET status = ? WHERE status = ?", (PENDING, RUNNING)
+            )
+            self.conn.commit()
+        semaphore = asyncio.Semaphore(concurrency)
+        while True:
+            await semaphore.acquire()
+            try:
+                row = self._claim_due()
+            except Exception:
+                # a database error must not stop the queue, the next poll retries
+                semaphore.release()
+                print(f"  [Job] worker error: {traceback.format_exc(limit=5)}")
+                await asyncio.sleep(poll_interval)
+                continue
+            if row is None:
+                semaphore.release()
+                self.wakeup.clear()
+                wait = self._next_due_in()
+                try:
+                    await asyncio.wait_for(
+                        self.wakeup.wait(),
+                        timeout=poll_interval if wait is None else min(wait, poll_interval),
+                    )
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            task = asyncio.create_task(self.run_job(*row))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+            task.add_done_callback(lambda _: semaphore.release())
+
+    def start(self, concurrency: int = 4) -> asyncio.Task:
+        """Starts the worker; keep the returned task referenced for as long as it runs."""
+        return asyncio.create_task(self.run_worker(concurrency))
+
+
+job_queue = JobQueue()
@@ -1,15 +1,39 @@
 from google.adk.sessions import DatabaseSessionService, InMemorySessionService
+from google.adk.sessions.base_session_service import GetSessionConfig
+from google.adk.agents.run_config import RunConfig, StreamingMode
 from google.adk.runners import Runner
 from google.genai import types
 
 from services.gcloud_service import initialize_vertex_ai, initialize_ai_platform
 
-from agent.agents import root_agent, scheduler_agent, pass_agent
+from agent.agents import (
+    root_agent,
+    scheduler_agent,
+    pass_agent,
+    build_chain,
+    STAGE_ONE_CHAIN,
+    STAGE_TWO_CHAIN,
+)
+from agent.cache import extraction_cache
+from agent.digest import StageDigest
+from agent.images import preprocess_images
+from agent.jobs import job_queue
+from agent.prefetch import current_prefetch, start_prefetch
+from agent.router import plan_route
+from agent.schemas import assemble_output
+from agent.sessions import MAX_SESSION_EVENTS, SessionStore, create_session_service
 
-from database.remainder import get_user_remainders
+from agent.scheduler import ReminderScheduler, run_bulk_schedule
+from agent.templates import message_cache, render_template
+from agent.tools.async_passes import collect_passes, commit_passes, discard_passes
+from agent.tools.reminder import reminder_store
 
-from typing import List
+from datetime import datetime
+from typing import Awaitable, Callable, List, Optional
+import asyncio
 import base64
+import time
+import uuid
 
 from services.database_service import get_session_service_db_url
 import json
@@ -31,11 +55,24 @@ def get_runner(agent, session_service) -> Runner:
     )
 
 
-db_session_service = DatabaseSessionService("sqlite:///data/ad_sessions.db")
+db_session_service = create_session_service("sqlite:///data/ad_sessions.db")
+session_store = SessionStore(db_session_service, APP_NAME)
 runner1 = get_runner(root_agent, db_session_service)
 runner2 = get_runner(pass_agent, db_session_service)
 
-im_session_service = DatabaseSessionService("sqlite:///data/adksessions.db")
+# runners for every agent chain the router can pick, built on first use
+chain_runners = {STAGE_ONE_CHAIN: runner1, STAGE_TWO_CHAIN: runner2}
+
+
+def get_chain_runner(chain) -> Runner:
+    if chain not in chain_runners:
+        chain_runners[chain] = get_runner(build_chain(chain), db_session_service)
+    return chain_runners[chain]
+
+
+im_session_service = create_session_service("sqlite:///data/adksessions.db")
+# the scheduler keeps one session per user, which grows with every reminder it renders
+schedule_session_store = SessionStore(im_session_service, APP_NAME)
 schedule_runner = get_runner(scheduler_agent, im_session_service)
 
 
@@ -46,101 +83,463 @@ async def asset_session_existence(runner, session_id: str | None, user_id: str):
             user_id=user_id,
         )
 
+    # only the events the agents still see are loaded, see SessionStore
     session = await runner.session_service.get_session(
-        session_id=session_id, app_name=APP_NAME, user_id=user_id
+        session_id=session_id,
+        app_name=APP_NAME,
+        user_id=user_id,
+        config=GetSessionConfig(num_recent_events=MAX_SESSION_EVENTS),
     )
     if session:
         return session
     else:
-        print("hello")
         return await runner.session_service.create_session(
             app_name=APP_NAME,
             user_id=user_id,
+            session_id=session_id,
+        )
+
+
+PASS_TOOLS = {
+    "insert_pass_object_string": "pass_created",
+    "insert_pass_objects": "pass_created",
+    "update_pass_object_string": "pass_updated",
+}
+
+
+def _stage_events(event) -> list:
+    """Maps an ADK event to the intermediate events reported to the client."""
+    stages = []
+    if event.actions and "extracted_content" in (event.actions.state_delta or {}):
+        stages.append(
+            {
+                "type": "stage",
+                "name": "receipt_extracted",
+                "data": event.actions.state_delta["extracted_content"],
+            }
         )
+    for response in event.get_function_responses():
+        if response.name in PASS_TOOLS:
+            stages.append(
+                {"type": "stage", "name": PASS_TOOLS[response.name], "data": response.response}
+            )
+        elif response.name == "add_reciept_data":
+            stages.append({"type": "stage", "name": "receipt_stored", "data": response.response})
+        elif response.name == "get_relevant_context":
+            stages.append({"type": "stage", "name": "context_retrieved", "data": None})
+    return stages
 
 
-async def call_agent_async(content, user_id, session_id):
-    """Sends a query to the agent and prints the final response."""
+def _final_text(event, default: str) -> str:
+    if event.content and event.content.parts:
+        return event.content.parts[0].text
+    elif event.actions and event.actions.escalate:  # Handle potential errors/escalations
+        return f"Agent escalated: {event.error_message or 'No specific message.'}"
+    return default
 
+
+async def stream_stage(
+    runner, content, user_id, session_id, digest, run_config=None, answering_agent=None
+):
+    """
+    Runs one agent chain and yields its stage events, plus {"type": "delta"}
+    events with partial text of `answering_agent`. Results are collected in digest.
+    """
     final_response_text = "Agent did not produce a final response."
     query = types.Content(role="user", parts=content)
-
-    session = await asset_session_existence(runner1, session_id, user_id)
-    content_added = "below is the previous history of call between the agent, that contains the required information"
-    async for event in runner1.run_async(
-        user_id=user_id, session_id=session.id, new_message=query
+    session = await asset_session_existence(runner, session_id, user_id)
+    async for event in runner.run_async(
+        user_id=user_id, session_id=session.id, new_message=query, run_config=run_config
     ):
-        content_added += f"  [Event] Author: {event.author}, Type: {type(event).__name__}, Final: {event.is_final_response()}, Content: {event.content}"
+        if event.partial:
+            if event.author == answering_agent and event.content and event.content.parts:
+                yield {"type": "delta", "text": event.content.parts[0].text or ""}
+            continue
+        for stage in _stage_events(event):
+            yield stage
+        digest.add_event(event)
 
         if event.is_final_response():
-            if event.content and event.content.parts:
-                final_response_text = event.content.parts[0].text
-            elif (
-                event.actions and event.actions.escalate
-            ):  # Handle potential errors/escalations
-                final_response_text = (
-                    f"Agent escalated: {event.error_message or 'No specific message.'}"
-                )
+            final_response_text = _final_text(event, final_response_text)
             break  # Stop processing events once the final response is found
+    digest.final_text = final_response_text or ""
+    if runner.session_service is db_session_service:
+        await session_store.compact(user_id, session.id)
 
-    content = content + [types.Part.from_text(text=content_added)]
-    query = types.Content(role="user", parts=content)
-    session = await asset_session_existence(runner2, session_id, user_id)
 
-    query = types.Content(role="user", parts=content)
-    async for event in runner2.run_async(
-        user_id=user_id, session_id=session.id, new_message=query
+def stage_two_parts(content, digest_text: str) -> list:
+    return content + [
+        types.Part.from_text(
+            text="below is the result of the previous stage of agents, that contains the required information:\n"
+            + digest_text
+        )
+    ]
+
+
+async def run_stage_two_job(payload: dict) -> dict:
+    """
+    Background job for the pass and relevancy stage of an early response.
+    Only the text parts of the message are kept, the stage one digest already
+    carries what was extracted from the images.
+    """
+    content = [types.Part.from_text(text=text) for text in payload["texts"]]
+    digest = StageDigest()
+    collect_passes(payload.get("run_id"))
+    try:
+        async for _ in stream_stage(
+            get_chain_runner(tuple(payload["stage_two"])),
+            stage_two_parts(content, payload["digest"]),
+            payload["user_id"],
+            payload["session_id"],
+            digest,
+        ):
+            pass
+    except BaseException:
+        # a failed attempt writes no passes, the retry stages them again
+        discard_passes()
+        raise
+    return {**digest.to_dict(), "passes": await commit_passes()}
+
+
+job_queue.register("stage_two", run_stage_two_job)
+
+
+async def stream_agent_async(
+    content,
+    user_id,
+    session_id,
+    run_config=None,
+    early_response=False,
+    fingerprints=None,
+):
+    """
+    Runs the routed agent stages and yields events as they arrive:
+    {"type": "stage"} for intermediate results, {"type": "delta"} for partial
+    text of the chat answer when run_config enables streaming, and a last
+    {"type": "final"} with the assembled response.
+    With early_response the response is final once stage one finishes, and the
+    pass and relevancy stage is handed to the background job queue; its job ID
+    is returned as backgroundJobId.
+    When the images are byte-identical to an earlier extraction in the extraction cache
+    (sha256 fingerprints from build_chat_parts), the images are replaced by the cached
+    result and the extraction hop is skipped.
+    """
+    cached_extraction = extraction_cache.lookup(user_id, fingerprints or [])
+    if cached_extraction is not None:
+        content = [part for part in content if not part.inline_data]
+    route = plan_route(content)
+    if cached_extraction is not None:
+        content = content + [
+            types.Part.from_text(
+                text="this is the content previously extracted from the attached reciept:\n"
+                + str(cached_extraction)
+            )
+        ]
+        print("  [Cache] receipt extraction served from the extraction cache")
+        yield {
+            "type": "stage",
+            "name": "receipt_extracted",
+            "data": cached_extraction,
+            "cached": True,
+        }
+    print(f"  [Route] {' -> '.join(route.stage_one + route.stage_two)} ({route.hops} hops)")
+    yield {
+        "type": "stage",
+        "name": "route",
+        "data": {"agents": list(route.stage_one + route.stage_two), "hops": route.hops},
+    }
+
+    # retrieval for the user's text only needs the text, so it runs while the
+    # extraction agent reads the image; relevancy refines it only if needed
+    if "extraction_agent" in route.stage_one:
+        start_prefetch(
+            user_id,
+            " ".join(part.text for part in content if part.text and part.text != CHAT_HEADER),
+        )
+    digest = StageDigest()
+    if cached_extraction is not None:
+        digest.extracted["extracted_content"] = cached_extraction
+    async for event in stream_stage(
+        get_chain_runner(route.stage_one),
+        content,
+        user_id,
+        session_id,
+        digest,
+        run_config,
+        answering_agent=route.stage_one[-1],
     ):
-        if event.is_final_response():
-            if event.content and event.content.parts:
-                final_response_text = event.content.parts[0].text
-            elif (
-                event.actions and event.actions.escalate
-            ):  # Handle potential errors/escalations
-                final_response_text = (
-                    f"Agent escalated: {event.error_message or 'No specific message.'}"
-                )
-            break  # Stop processing events once the final response is found
+        yield event
 
-    return final_response_text
+    current_prefetch.set(None)
+    if fingerprints and cached_extraction is None and "extracted_content" in digest.extracted:
+        extraction_cache.store(
+            user_id, fingerprints, digest.extracted["extracted_content"]
+        )
 
+    stage_two_digest = None
+    committed_passes = None
+    job_id = None
+    if route.stage_two:
+        digest_text = digest.to_text()
+        print(f"  [Digest] stage one digest is {digest.size_bytes} bytes")
+        if early_response:
+            job_id = job_queue.enqueue(
+                "stage_two",
+                {
+                    "texts": [part.text for part in content if part.text],
+                    "digest": digest_text,
+                    "stage_two": list(route.stage_two),
+                    "user_id": user_id,
+                    "session_id": session_id,
+                    # pass IDs derive from it, so a retried job rewrites its own passes
+                    "run_id": uuid.uuid4().hex,
+                },
+            )
+        else:
+            stage_two_digest = StageDigest()
+            # the passes of this run are written in one batch when the stage ends
+            collect_passes()
+            try:
+                async for event in stream_stage(
+                    get_chain_runner(route.stage_two),
+                    stage_two_parts(content, digest_text),
+                    user_id,
+                    session_id,
+                    stage_two_digest,
+                    run_config,
+                ):
+                    if event["type"] != "delta":
+                        yield event
+            except BaseException:
+                # nothing of a failed or abandoned run is written
+                discard_passes()
+                raise
+            committed_passes = await commit_passes()
+            if committed_passes:
+                yield {"type": "stage", "name": "passes_committed", "data": committed_passes}
 
-def getAsJSON(response):
-    response = response.strip().replace("```json", "").replace("```", "").strip()
-    print("kkkk", response)
-    return json.loads(response)
+    output = assemble_output(digest, stage_two_digest, committed_passes)
+    output.backgroundJobId = job_id
+    yield {"type": "final", "response": output.model_dump()}
 
 
-async def call_agent_chat(current_query: List[dict], user_id: str, session_id: str):
-    parts_list = [types.Part.from_text(text="this is a chat message from user")]
+async def call_agent_async(
+    content, user_id, session_id, early_response=False, fingerprints=None
+) -> dict:
+    """Sends a query to the agent and returns the assembled response."""
+    async for event in stream_agent_async(
+        content,
+        user_id,
+        session_id,
+        early_response=early_response,
+        fingerprints=fingerprints,
+    ):
+        if event["type"] == "final":
+            return event["response"]
+
+
+CHAT_HEADER = "this is a chat message from user"
+
+
+async def build_chat_parts(current_query: List[dict]) -> tuple:
+    """
+    Builds the message parts of a chat, with every image preprocessed on the
+    image thread pool. Image content is either base64 text or raw bytes.
+    Returns the parts, the image byte counts and the fingerprints of the images.
+    """
+    images = []
+    for query in current_query:
+        if query["message_type"] == "img":
+            # raw bytes from the upload endpoint are used as they are
+            if isinstance(query["content"], (bytes, bytearray)):
+                images.append(query["content"])
+                continue
+            try:
+                images.append(base64.b64decode(query["content"]))
+            except Exception as e:
+                images.append(None)
+    processed = iter(await preprocess_images([data for data in images if data]))
+
+    parts_list = [types.Part.from_text(text=CHAT_HEADER)]
+    stats = {"images": sum(1 for data in images if data), "original_bytes": 0, "sent_bytes": 0}
+    fingerprints = []
     for query in current_query:
         if query["message_type"] == "text":
             parts_list.append(types.Part.from_text(text=query["content"]))
         elif query["message_type"] == "img":
-            try:
-                parts_list.append(
-                    types.Part.from_bytes(
-                        data=base64.b64decode(query["content"]), mime_type="image/png"
-                    )
-                )
-            except Exception as e:
-                pass
-    response = await call_agent_async(parts_list, user_id, session_id)
-    return getAsJSON(response)
+            if not images.pop(0):
+                continue
+            image = next(processed)
+            parts_list.append(
+                types.Part.from_bytes(data=image.data, mime_type=image.mime_type)
+            )
+            stats["original_bytes"] += image.original_size
+            stats["sent_bytes"] += len(image.data)
+            fingerprints.append(image.sha256)
+    stats["saved_bytes"] = stats["original_bytes"] - stats["sent_bytes"]
+    if stats["images"]:
+        print(
+            f"  [Images] {stats['images']} image(s), {stats['original_bytes']} -> {stats['sent_bytes']} bytes, saved {stats['saved_bytes']}"
+        )
+    return parts_list, stats, fingerprints
+
+
+async def call_agent_chat(
+    current_query: List[dict], user_id: str, session_id: str, early_response=False
+):
+    parts_list, _, fingerprints = await build_chat_parts(current_query)
+    return await call_agent_async(
+        parts_list, user_id, session_id, early_response, fingerprints
+    )
+
+
+def get_background_job(job_id: str) -> dict | None:
+    """Status of the background pass and relevancy work of an early response."""
+    return job_queue.get_status(job_id)
+
+
+async def stream_agent_chat(
+    current_query: List[dict], user_id: str, session_id: str, early_response=False
+):
+    """
+    Streaming variant of call_agent_chat. Yields {"type": "stage"} events such as
+    "receipt_extracted" and "pass_created", {"type": "delta"} events with new
+    chatResponse text, and a last {"type": "done"} event with the full response.
+    """
+    parts_list, image_stats, fingerprints = await build_chat_parts(current_query)
+    if image_stats["images"]:
+        yield {"type": "stage", "name": "images_preprocessed", "data": image_stats}
+    async for event in stream_agent_async(
+        parts_list,
+        user_id,
+        session_id,
+        RunConfig(streaming_mode=StreamingMode.SSE),
+        early_response,
+        fingerprints,
+    ):
+        if event["type"] == "final":
+            yield {"type": "done", "response": event["response"]}
+        else:
+            yield event
+
+
+def reminder_text(reminder: dict) -> str:
+    if reminder["repeat"] != "none":
+        # no date, so the message can be cached and sent again on the next occurrence
+        return f"{reminder['title']} (repeats {reminder['repeat']}): {reminder['message']}"
+    fire_at = datetime.fromtimestamp(reminder["next_fire_at"]).isoformat(timespec="minutes")
+    return f"{reminder['title']} (due {fire_at}): {reminder['message']}"
 
 
-async def call_agent_scheduler(user_id: str):
-    """Call the agent scheduler."""
-    session = await asset_session_existence("tz1", user_id)
-    remainders = await get_user_remainders(session.id)
-    if not remainders:
-        return "No chat history found."
+async def call_agent_scheduler(user_id: str, reminders: List[dict] | None = None):
+    """
+    Call the agent scheduler for the given reminders of a user, by default the
+    ones that are due now.
+    """
+    if reminders is None:
+        reminders = reminder_store.due(time.time(), user_id)
+    if not reminders:
+        return "No reminders are due."
     parts_list = [
         types.Part.from_text(
-            text="this is a remainder meassage from scheduler, below are all the remainders for the user"
+            text="this is a remainder meassage from scheduler, below are all the remainders for the user that are due"
         )
     ]
-    for reminder in remainders:
-        parts_list.append(types.Part.from_text(text=reminder["remainder_data"]))
-    content = types.Content(role="user", parts=parts_list)
-    return await call_agent_async(schedule_runner, content, user_id, session.id)
+    for reminder in reminders:
+        parts_list.append(types.Part.from_text(text=reminder_text(reminder)))
+
+    session = await asset_session_existence(
+        schedule_runner, f"scheduler-{user_id}", user_id
+    )
+    final_response_text = "Agent did not produce a final response."
+    async for event in schedule_runner.run_async(
+        user_id=user_id,
+        session_id=session.id,
+        new_message=types.Content(role="user", parts=parts_list),
+    ):
+        if event.is_final_response():
+            final_response_text = _final_text(event, final_response_text)
+            break
+    await schedule_session_store.compact(user_id, session.id)
+    return final_response_text
+
+
+async def compose_reminders(user_id: str, reminders: List[dict], now: float) -> str:
+    """
+    Builds the notification for due reminders of a user. Templated reminders
+    are filled from spend data and recurring ones reuse their cached message,
+    so the scheduler agent only sees free-form reminders it has not rendered.
+    """
+    messages, free_form = [], []
+    for reminder in reminders:
+        # the spend provider reads Firestore with the blocking client
+        message = await asyncio.to_thread(
+            render_template, reminder, datetime.fromtimestamp(now)
+        ) or message_cache.get(reminder)
+        if message is None:
+            free_form.append(reminder)
+        else:
+            messages.append(message)
+    if free_form:
+        message = await call_agent_scheduler(user_id, free_form)
+        if len(free_form) == 1:
+            message_cache.store(free_form[0], message)
+        messages.append(message)
+    print(
+        f"  [Reminder] {user_id}: {len(reminders) - len(free_form)} rendered, "
+        f"{len(free_form)} sent to the scheduler agent"
+    )
+    return "\n".join(messages)
+
+
+# sends a composed reminder message to a user: (user_id, message) -> None
+ReminderSender = Callable[[str, str], Awaitable[None]]
+
+
+async def log_reminder(user_id: str, message: str):
+    """The default reminder sender, which only logs the message."""
+    print(f"  [Reminder] {user_id}: {message}")
+
+
+reminder_sender: ReminderSender = log_reminder
+
+
+def set_reminder_sender(sender: ReminderSender):
+    """
+    Registers the channel reminders are sent through, e.g. a push notification
+    or an update of the user's reminder pass. Until one is registered the
+    messages are only logged.
+    """
+    global reminder_sender
+    reminder_sender = sender
+
+
+async def deliver_reminder(reminder: dict):
+    """Delivery hook of the ReminderScheduler for one due reminder."""
+    message = await compose_reminders(reminder["user_id"], [reminder], time.time())
+    await reminder_sender(reminder["user_id"], message)
+
+
+reminder_scheduler = ReminderScheduler(deliver_reminder)
+
+
+async def process_user_reminders(user_id: str, now: float):
+    """
+    Bulk run handler: claims a user's due reminders by scheduling their next
+    occurrence, then sends the ones it claimed. Reminders the live scheduler
+    claimed first are left to it.
+    """
+    reminders = [
+        reminder
+        for reminder in reminder_store.due(now, user_id)
+        if reminder_store.advance(reminder, now)
+    ]
+    if not reminders:
+        return
+    await reminder_sender(user_id, await compose_reminders(user_id, reminders, now))
+
+
+async def run_nightly_reminders(run_id: Optional[str] = None, concurrency: int = 50) -> dict:
+    """Processes due reminders of all users; the same run_id resumes an interrupted run."""
+    run_id = run_id or datetime.now().strftime("nightly-%Y-%m-%d")
+    return await run_bulk_schedule(process_user_reminders, run_id, concurrency)
@@ -0,0 +1,112 @@
+import re
+import time
+from typing import Dict, Optional
+
+# amounts with a currency marker are preferred over bare numbers, which
+# are often quantities or product ids
+CURRENCY_PRICE = re.compile(
+    r"(?:₹|\$|rs\.?|inr|usd)\s*(\d+(?:,\d{3})*(?:\.\d+)?)", re.IGNORECASE
+)
+BARE_PRICE = re.compile(r"(?<![\w.])(\d+(?:,\d{3})*(?:\.\d+)?)(?![\w.])")
+
+
+def extract_price(text: str) -> Optional[float]:
+    """
+    Pulls the price offered in a negotiation message.
+    Args:
+        text (str): The message of one party.
+    Returns:
+        Optional[float]: The last amount mentioned, None if there is none.
+    """
+    if not text:
+        return None
+    matches = CURRENCY_PRICE.findall(text) or BARE_PRICE.findall(text)
+    if not matches:
+        return None
+    return float(matches[-1].replace(",", ""))
+
+
+class NegotiationController:
+    """
+    Decides when a negotiation should stop.
+
+    A negotiation ends when an agent says 'break', when the last offers of
+    both parties are within `tolerance` of each other, when neither party has
+    moved its price for `stall_turns` turns after both made an offer, or
+    when the turn or wall-clock budget is spent. At most `max_turns` model
+    calls are made per negotiation.
+    """
+
+    def __init__(
+        self,
+        max_turns: int = 12,
+        time_budget: float = 120.0,
+        tolerance: float = 0.02,
+        stall_turns: int = 4,
+    ):
+        self.max_turns = max_turns
+        self.time_budget = time_budget
+        self.tolerance = tolerance
+        self.stall_turns = stall_turns
+        self.turns = 0
+        self.offers: Dict[str, float] = {}
+        self.last_move_turn = 0
+        self.stop_reason: Optional[str] = None
+        self.started = time.monotonic()
+
+    def remaining_time(self) -> float:
+        return self.time_budget - (time.monotonic() - self.started)
+
+    def can_continue(self) -> bool:
+        """Checked before every model call."""
+        if self.stop_reason:
+            return False
+        if self.turns >= self.max_turns:
+            self.stop_reason = "max_turns"
+        elif self.remaining_time() <= 0:
+            self.stop_reason = "time_budget"
+        return self.stop_reason is None
+
+    def record(self, user_type: str, text: str) -> Optional[float]:
+        """
+        Records one turn and updates the stop reason.
+        Args:
+            user_type (str): "seller" or "customer".
+            text (str): The message produced on this turn.
+        Returns:
+            Optional[float]: The price offered on this turn, if any.
+        """
+        self.turns += 1
+        if text.strip().lower() == "break":
+            self.stop_reason = "break"
+            return None
+
+        price = extract_price(text)
+        if price is not None and self.offers.get(user_type) != price:
+            self.offers[user_type] = price
+            self.last_move_turn = self.turns
+
+        if self._converged():
+            self.stop_reason = "converged"
+        elif self._stalled():
+            self.stop_reason = "stalled"
+        return price
+
+    def agreed_price(self) -> Optional[float]:
+        """The midpoint of the last offers once the negotiation converged."""
+        if self.stop_reason != "converged":
+            return None
+        return round(sum(self.offers.values()) / len(self.offers), 2)
+
+    def _converged(self) -> bool:
+        if len(self.offers) < 2:
+            return False
+        low, high = sorted(self.offers.values())
+        return high - low <= self.tolerance * high
+
+    def _stalled(self) -> bool:
+        # neither party has changed its price for stall_turns turns, counted
+        # once both have made an offer, so opening small talk never stalls
+        if len(self.offers) < 2:
+            return False
+        return self.turns - self.last_move_turn >= self.stall_turns
@@ -0,0 +1,39 @@
+import asyncio
+from contextvars import ContextVar
+from typing import Optional
+
+from agent.tools.relevancy import prefetch_context
+
+# retrieval started for the message the current task is running the agents for
+current_prefetch: ContextVar[Optional[asyncio.Task]] = ContextVar(
+    "current_prefetch", default=None
+)
+
+
+def start_prefetch(user_id: str, query: str) -> Optional[asyncio.Task]:
+    """
+    Starts retrieving context for the user's text in a worker thread, so it
+    runs while the extraction agent reads the receipt image.
+    """
+    if not query.strip():
+        return None
+    task = asyncio.create_task(asyncio.to_thread(prefetch_context, user_id, query))
+    current_prefetch.set(task)
+    return task
+
+
+async def inject_prefetched_context(callback_context):
+    """
+    before_agent_callback of get_relevency_agent: waits for the prefetch of the
+    current message and exposes it as the 'prefetched_context' state value.
+    """
+    task = current_prefetch.get()
+    if task is None:
+        # do not leave the context of an earlier message in the session state
+        callback_context.state["prefetched_context"] = ""
+        return None
+    try:
+        callback_context.state["prefetched_context"] = await task
+    except Exception as e:
+        print(f"  [Prefetch] failed: {e}")
+    return None
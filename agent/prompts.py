@@ -30,22 +30,30 @@ prompts = {
                         individual tax (if not available, use 0)
                     4. vendor name (if not available, use None)
                     5. other meaningful informations that you can extract from the reciept image in any format at is understandable by generatice AIs.
+                once extracted, store the reciept with the 'add_reciept_data' tool, with a spending category such as groceries, dining, travel, shopping or other
+                if the user asks to remove a reciept, use the 'delete_reciept_data' tool
                 If you donot have the required tools or a need for this agent, go on to the 'get_relevency_agent' agent
                 you will use this knowledge in the "get_relevency_agent" agent for further processing.
                 redirect to the 'get_relevency_agent' agent
                 """,
     },
     "get_relevency_agent": {
-        "description": "add relevent contexts to the user",
+        "description": "add relevent contexts to the user and answers the user",
         "instruction": """
                 You are a helpful agent for adding relevent contexts to the question if there are any.
+                summary of the earlier conversation: <context '{history_summary?}'>
+                context already retrieved for the user's text: <context '{prefetched_context?}'>
                 You are to do the following:
-                    get relevent details from the database regarding the text or reciept provided by the user using the 'get_relevant_context' tool
-                If you donot have the required tools or a need for this agent, go on to the 'pass_agent`' agent
-                you will output this knowledge as a string and you are the final agent
+                    1. if the context above is enough, use it as it is; otherwise get relevent details from the database
+                       regarding the text or reciept provided by the user using the 'get_relevant_context' tool,
+                       with a query refined by what was extracted from the reciept
+                    2. for questions about how much the user spent, use the 'get_spend_summary' tool instead of adding up reciepts from the context
+                    3. if there is any text from the user, answer the question using the information available in the reciept and the relevent context
+                    4. if only a reciept is provided, briefly describe what was extracted from it
+                    5. if the user asks to remove a reciept, find its ID with the 'get_relevant_context' tool and delete it using the 'delete_reciept_data' tool
+                your output is shown to the user as it is, so reply in plain text and not in JSON
+                you are the final agent
                 """,
-        # you will use this knowledge in the "pass_agent" agent for further processing.
-        # redirect to the 'pass_agent' agent
     },
     "chat_agent": {
         "description": "Agent that handles chat interactions",
@@ -77,9 +85,10 @@ prompts = {
                 You are to use this passes feature to show information in the google wallet
                 You have the following functionalities
                     1. You can create new Passes classe
-                    2. You can create new Passes Object for the corresponding Passes class
+                    2. You can create new Passes Object for the corresponding Passes class, when creating several passes at once use 'insert_pass_objects'
                     3. You can update old Passes Object of the user
                     4. You can delete old Passes Object of the user and also the corresponding Passes class if there are no object left of it
+                    5. if the user asks to set, change or remove a reminder, use the reminder tools; the scheduler fires them when they are due. for recurring spending summaries set the matching template
                 If you donot have the required tools or a need for this agent, go on to the 'add_relevency_agent' agent
                 You have functionalities to fetch,create,update,delete the passes of the user by using the tools available
                 You are not the final agent, so transfer_to_agent "add_relevency_agent" and dont set the finish_reason to STOP.
@@ -92,24 +101,7 @@ prompts = {
                 You are to do the following:
                     add elaborate context of information on reciept, pass, user info. those should match the queries of the user if user for vector matching
 
-                If you donot have the required tools or a need for this agent, go on to the 'output_agent' agent
                 You have functionalities to fetch,create,update,delete the passes of the user by using the tools available
-                You are not the final agent, so transfer_to_agent "output_agent" and dont set the finish_reason to STOP.
-                """,
-    },
-    "output_agent": {
-        "description": "Agent that formats and outputs the final response",
-        "instruction": """
-                You are a helpful agent for formatting and outputting the final response.
-                the output format of the response is JSON
-                the structure of json is given below:
-                {
-                    "isRecieptExtracted": <wheather extraction agent extracted any reciept and inserted it into the database>,
-                    "extractedRecieptID": <id of the reciept extracted and stored in the database by the extraction agent, null if not done>,
-                    "shouldAddPass": <wheather a new pass is added by the passes agent>,
-                    "updatedPasses": <pass object data to be added by the passes agent, null if not done>,
-                    "chatResponse": <response to the user question by the chat agent> ,
-                }
                 You are the final agent
                 """,
     },
@@ -118,6 +110,7 @@ prompts = {
         "instruction": """
                  You are a helpful agent for scheduling tasks and setting reminders.
                  Your role is to manage tasks and provide updates on scheduled items.
+                 Write a short notification for the reminders. Do not restate dates of recurring reminders, their notification is reused every time they fire.
                 """,
     },
 }
@@ -0,0 +1,74 @@
+from typing import List, NamedTuple, Tuple
+
+from agent.agents import STAGE_ONE_CHAIN, STAGE_TWO_CHAIN
+
+# words in the user's text that ask for pass or reminder work even without a receipt
+PASS_INTENT_KEYWORDS = {
+    "pass",
+    "passes",
+    "wallet",
+    "remind",
+    "reminder",
+    "reminders",
+    "remainder",
+    "remainders",
+}
+
+# phrases asking for it with words that are too common on their own, like "add" or "save"
+PASS_INTENT_PHRASES = (
+    "save this receipt",
+    "save the receipt",
+    "save my receipt",
+    "store this receipt",
+    "store the receipt",
+    "add this receipt",
+    "add the receipt",
+    "update the receipt",
+    "update my receipt",
+    "track this expense",
+    "track my expenses",
+    "track my spending",
+)
+
+
+class Route(NamedTuple):
+    stage_one: Tuple[str, ...]
+    stage_two: Tuple[str, ...]
+
+    @property
+    def hops(self) -> int:
+        return len(self.stage_one) + len(self.stage_two)
+
+
+def has_image(parts: List) -> bool:
+    return any(part.inline_data for part in parts)
+
+
+def has_pass_intent(parts: List) -> bool:
+    text = " ".join(part.text for part in parts if part.text).lower()
+    words = text.replace(",", " ").replace(".", " ").replace("?", " ").split()
+    if PASS_INTENT_KEYWORDS.intersection(words):
+        return True
+    text = f" {' '.join(words)} "
+    return any(f" {phrase} " in text for phrase in PASS_INTENT_PHRASES)
+
+
+def plan_route(parts: List) -> Route:
+    """
+    Decides which agent hops a chat message needs, without a model call.
+    Extraction runs only when an image is attached, pass creation and relevancy
+    writes only when there is a receipt or the user asks for pass or reminder
+    work, otherwise stage two is skipped entirely. Only leading hops are skipped,
+    so every agent in a route still finds the agent it transfers to.
+    Args:
+        parts (List): The parts of the incoming user message.
+    Returns:
+        Route: The agent chains to run for stage one and stage two.
+    """
+    image = has_image(parts)
+    stage_one = STAGE_ONE_CHAIN if image else STAGE_ONE_CHAIN[1:]
+    if image or has_pass_intent(parts):
+        stage_two = STAGE_TWO_CHAIN
+    else:
+        stage_two = ()
+    return Route(stage_one=stage_one, stage_two=stage_two)
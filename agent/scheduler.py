@@ -0,0 +1,211 @@
+import asyncio
+import heapq
+import sqlite3
+import time
+import traceback
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from agent.tools.reminder import ReminderStore, reminder_store
+
+BULK_RUNS_DB_PATH = "data/bulk_runs.db"
+
+# the heap is refilled from the store when it runs dry or its earliest entry
+# is past the last reminder loaded, so it only holds the earliest reminders
+# rather than every scheduled one
+HEAP_REFILL_SIZE = 1000
+# seconds before a crashed dispatcher is started again
+RESTART_DELAY = 5.0
+
+
+class ReminderScheduler:
+    """
+    Fires reminders when they are due.
+
+    Upcoming reminders sit in a heap keyed on their next fire time and the
+    dispatcher sleeps until the earliest one, waking early only when a
+    reminder is added or rescheduled. Entries are checked against the store
+    before they fire, so edits and deletes never need a heap removal.
+    A reminder is claimed by moving it to its next occurrence before it is
+    delivered, so a bulk run processing the same user never delivers it twice.
+    """
+
+    def __init__(
+        self,
+        deliver: Callable[[dict], Awaitable[None]],
+        store: ReminderStore = reminder_store,
+    ):
+        self.deliver = deliver
+        self.store = store
+        self.heap: List[Tuple[float, str]] = []
+        self.horizon = float("inf")
+        self.changed = asyncio.Event()
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        # running deliveries, referenced so they are not garbage collected
+        self.tasks = set()
+        store.listeners.append(self.on_change)
+
+    def on_change(self, reminder_id: str, next_fire_at: Optional[float]):
+        # tools may run outside the event loop thread
+        if next_fire_at is None or self.loop is None:
+            return
+        self.loop.call_soon_threadsafe(self._push, next_fire_at, reminder_id)
+
+    def _push(self, next_fire_at: float, reminder_id: str):
+        heapq.heappush(self.heap, (next_fire_at, reminder_id))
+        self.changed.set()
+
+    def _refill(self):
+        self.heap = self.store.upcoming(HEAP_REFILL_SIZE)
+        heapq.heapify(self.heap)
+        # every stored reminder due up to the horizon is in the heap
+        full = len(self.heap) == HEAP_REFILL_SIZE
+        self.horizon = max(self.heap)[0] if full else float("inf")
+
+    async def fire(self, reminder: dict):
+        try:
+            await self.deliver(reminder)
+        except Exception as e:
+            print(f"  [Scheduler] delivering reminder {reminder['id']} failed: {e}")
+
+    async def run(self):
+        """Dispatches due reminders forever."""
+        self.loop = asyncio.get_running_loop()
+        self._refill()
+        while True:
+            # past the horizon stored reminders may be due before heap[0]
+            if not self.heap or self.heap[0][0] > self.horizon:
+                self._refill()
+            now = time.time()
+            if self.heap and self.heap[0][0] <= now:
+                fire_at, reminder_id = heapq.heappop(self.heap)
+                reminder = self.store.get(reminder_id)
+                # stale entry of a deleted or rescheduled reminder
+                if reminder is None or reminder["next_fire_at"] != fire_at:
+                    continue
+                # claimed by a bulk run in the meantime
+                if not self.store.advance(reminder, now):
+                    continue
+                task = asyncio.create_task(self.fire(reminder))
+                self.tasks.add(task)
+                task.add_done_callback(self.tasks.discard)
+                continue
+            self.changed.clear()
+            timeout = self.heap[0][0] - now if self.heap else None
+            try:
+                await asyncio.wait_for(self.changed.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def run_forever(self, restart_delay: float = RESTART_DELAY):
+        """Runs the dispatcher, restarting it after a crash so reminders keep firing."""
+        while True:
+            try:
+                await self.run()
+            except Exception:
+                print(f"  [Scheduler] dispatcher failed: {traceback.format_exc(limit=5)}")
+                await asyncio.sleep(restart_delay)
+
+    def start(self) -> asyncio.Task:
+        return asyncio.create_task(self.run_forever())
+
+
+class BulkCheckpoint:
+    """Users already processed by a bulk run, so an interrupted run can resume."""
+
+    def __init__(self, db_path: str = BULK_RUNS_DB_PATH):
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS bulk_runs (
+                run_id TEXT NOT NULL,
+                user_id TEXT NOT NULL,
+                finished_at REAL NOT NULL,
+                PRIMARY KEY (run_id, user_id)
+            )
+            """
+        )
+        self.conn.commit()
+
+    def done_users(self, run_id: str) -> set:
+        rows = self.conn.execute(
+            "SELECT user_id FROM bulk_runs WHERE run_id = ?", (run_id,)
+        ).fetchall()
+        return {row[0] for row in rows}
+
+    def mark_done(self, run_id: str, user_id: str):
+        self.conn.execute(
+            "INSERT OR IGNORE INTO bulk_runs (run_id, user_id, finished_at) VALUES (?, ?, ?)",
+            (run_id, user_id, time.time()),
+        )
+        self.conn.commit()
+
+
+async def run_bulk_schedule(
+    process_user: Callable[[str, float], Awaitable[None]],
+    run_id: str,
+    concurrency: int = 50,
+    page_size: int = 500,
+    store: ReminderStore = reminder_store,
+    checkpoint: Optional[BulkCheckpoint] = None,
+    progress_every: int = 100,
+) -> dict:
+    """
+    Processes the due reminders of every user, up to `concurrency` users at a time.
+
+    Users are paged from the store in ID order and every finished user is
+    checkpointed under run_id, so running again with the same run_id skips
+    them. A failed user is reported and left out of the checkpoint to be
+    retried by the next run.
+    Args:
+        process_user: Coroutine handling the due reminders of one user, called
+            with the user ID and the time the run started.
+        run_id (str): Identifies the run for resuming, e.g. the date of a nightly run.
+        concurrency (int): Users processed at the same time.
+        page_size (int): Users read from the store per page.
+    Returns:
+        dict: Counts of processed, skipped and failed users, elapsed seconds
+            and users per second, None when the run took under 10ms.
+    """
+    checkpoint = checkpoint or BulkCheckpoint()
+    now = time.time()
+    done = checkpoint.done_users(run_id)
+    total = store.count_users_due(now)
+    semaphore = asyncio.Semaphore(concurrency)
+    stats = {"processed": 0, "skipped": 0, "failed": 0}
+    started = time.monotonic()
+
+    async def handle(user_id: str):
+        async with semaphore:
+            try:
+                await process_user(user_id, now)
+            except Exception as e:
+                stats["failed"] += 1
+                print(f"  [Bulk {run_id}] {user_id} failed: {e}")
+                return
+        checkpoint.mark_done(run_id, user_id)
+        stats["processed"] += 1
+        if stats["processed"] % progress_every == 0:
+            elapsed = time.monotonic() - started
+            print(
+                f"  [Bulk {run_id}] {stats['processed'] + stats['skipped']}/{total} users, "
+                f"{stats['processed'] / elapsed:.1f} users/s"
+            )
+
+    after = ""
+    while True:
+        user_ids = store.users_due(now, after, page_size)
+        if not user_ids:
+            break
+        after = user_ids[-1]
+        pending = [user_id for user_id in user_ids if user_id not in done]
+        stats["skipped"] += len(user_ids) - len(pending)
+        await asyncio.gather(*(handle(user_id) for user_id in pending))
+
+    elapsed = time.monotonic() - started
+    stats["elapsed"] = round(elapsed, 2)
+    # a rate over a run too short to time would be meaningless
+    stats["users_per_second"] = (
+        round(stats["processed"] / elapsed, 2) if stats["elapsed"] > 0 else None
+    )
+    print(f"  [Bulk {run_id}] finished: {stats}")
+    return stats
@@ -0,0 +1,73 @@
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+
+class PassUpdate(BaseModel):
+    objectId: Optional[str] = None
+    action: str
+    status: Optional[str] = None
+
+
+class ChatOutput(BaseModel):
+    """The response of the receipt agent pipeline, as the app consumes it."""
+
+    isRecieptExtracted: bool = False
+    extractedRecieptID: Optional[str] = None
+    shouldAddPass: bool = False
+    updatedPasses: Optional[List[PassUpdate]] = None
+    chatResponse: str = ""
+    backgroundJobId: Optional[str] = None
+
+
+def _tool_value(result) -> dict:
+    # ADK wraps tool return values that are not dicts as {"result": value}
+    return result if isinstance(result, dict) else {"result": result}
+
+
+def assemble_output(stage_one, stage_two=None, committed_passes=None) -> ChatOutput:
+    """
+    Builds the pipeline response in code from the StageDigests of both stages,
+    in place of a model hop that formats JSON.
+    Args:
+        stage_one: StageDigest of the extraction and relevancy stage.
+        stage_two: StageDigest of the pass and relevancy stage, None if it did not run.
+        committed_passes: Results of committing the stage's pass batch, which
+            replace the staged status of the updates it holds.
+    Returns:
+        ChatOutput: The validated response.
+    """
+    committed = {entry["object_id"]: entry for entry in committed_passes or []}
+    passes = []
+    for tool_result in stage_two.tool_results if stage_two else []:
+        result = _tool_value(tool_result["result"])
+        if tool_result["tool"] == "insert_pass_object_string":
+            passes.append(PassUpdate(objectId=result.get("result"), action="inserted"))
+        elif tool_result["tool"] == "insert_pass_objects":
+            # an error message instead of a list inserted nothing
+            object_ids = result.get("result")
+            passes.extend(
+                PassUpdate(objectId=object_id, action="inserted")
+                for object_id in (object_ids if isinstance(object_ids, list) else [])
+            )
+        elif tool_result["tool"] == "update_pass_object_string":
+            object_id = result.get("object_id")
+            passes.append(
+                PassUpdate(
+                    objectId=object_id,
+                    action="updated",
+                    status=committed.get(object_id, result).get("status"),
+                )
+            )
+    receipt_ids = [
+        _tool_value(tool_result["result"]).get("result")
+        for tool_result in stage_one.tool_results
+        if tool_result["tool"] == "add_reciept_data"
+    ]
+    return ChatOutput(
+        isRecieptExtracted="extracted_content" in stage_one.extracted,
+        extractedRecieptID=receipt_ids[-1] if receipt_ids else None,
+        shouldAddPass=any(update.action == "inserted" for update in passes),
+        updatedPasses=passes or None,
+        chatResponse=stage_one.final_text,
+    )
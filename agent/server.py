@@ -0,0 +1,234 @@
+import asyncio
+import json
+from contextlib import asynccontextmanager
+
+from fastapi import (
+    FastAPI,
+    File,
+    Form,
+    HTTPException,
+    UploadFile,
+    WebSocket,
+    WebSocketDisconnect,
+)
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, ValidationError
+from typing import List
+
+from agent.bargain import stream_action
+from agent.jobs import job_queue
+from agent.main import (
+    call_agent_chat,
+    get_background_job,
+    reminder_scheduler,
+    schedule_session_store,
+    session_store,
+    stream_agent_chat,
+)
+
+
+# --- Pydantic Models for Data Validation ---
+class BargainRequest(BaseModel):
+    customerId: str
+    sellerId: str
+    productId: str
+
+
+class ChatMessage(BaseModel):
+    message_type: str
+    content: str
+
+
+class ChatRequest(BaseModel):
+    userId: str
+    sessionId: str | None = None
+    query: List[ChatMessage]
+    earlyResponse: bool = False
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Runs the job queue, session maintenance and reminder scheduler with the app."""
+    tasks = [
+        job_queue.start(),
+        session_store.start(),
+        schedule_session_store.start(),
+        reminder_scheduler.start(),
+    ]
+    yield
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+# receipts larger than this are rejected before they reach the pipeline
+MAX_UPLOAD_BYTES = 20 * 1024 * 1024
+# an upload request carries at most this many receipts' worth of bytes
+MAX_UPLOAD_REQUEST_BYTES = 5 * MAX_UPLOAD_BYTES
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+
+
+class UploadSizeLimit:
+    """
+    ASGI middleware capping /chat/upload request bodies at max_bytes. A
+    Content-Length over the cap is refused before the multipart body is
+    parsed; bodies without one, like chunked uploads, are counted as they
+    are received and refused once they pass it.
+    """
+
+    def __init__(self, app, max_bytes: int = MAX_UPLOAD_REQUEST_BYTES):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] != "/chat/upload":
+            return await self.app(scope, receive, send)
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length is not None and (
+            not content_length.isdigit() or int(content_length) > self.max_bytes
+        ):
+            response = JSONResponse({"detail": "Upload is too large."}, status_code=413)
+            return await response(scope, receive, send)
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    raise HTTPException(status_code=413, detail="Upload is too large.")
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+app.add_middleware(UploadSizeLimit)
+
+
+async def read_upload(image: UploadFile) -> bytes:
+    """
+    Reads an uploaded image, refusing it past MAX_UPLOAD_BYTES. An image of
+    known size is read in one go, one of unknown size is read in chunks into
+    a single buffer, stopping as soon as it passes the limit.
+    """
+    if image.size is not None:
+        if image.size > MAX_UPLOAD_BYTES:
+            raise HTTPException(status_code=413, detail=f"{image.filename} is too large.")
+        return await image.read()
+    data = bytearray()
+    while chunk := await image.read(UPLOAD_CHUNK_BYTES):
+        if len(data) + len(chunk) > MAX_UPLOAD_BYTES:
+            raise HTTPException(status_code=413, detail=f"{image.filename} is too large.")
+        data += chunk
+    return data
+
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+def sse_event(data: dict) -> str:
+    return f"event: {data['type']}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+# --- API Endpoints ---
+@app.post("/bargain/stream")
+async def bargain_stream(request: BargainRequest):
+    """Streams every negotiation turn, and token deltas, as Server-Sent Events."""
+
+    async def events():
+        async for event in stream_action(
+            request.customerId, request.sellerId, request.productId
+        ):
+            yield sse_event(event)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+@app.websocket("/bargain/ws")
+async def bargain_ws(websocket: WebSocket):
+    """Receives one BargainRequest as JSON and sends every negotiation event back."""
+    await websocket.accept()
+    try:
+        try:
+            request = BargainRequest(**await websocket.receive_json())
+        except (ValidationError, ValueError, TypeError) as e:
+            # invalid JSON, a payload that is not an object, or missing fields
+            await websocket.send_json({"type": "error", "detail": str(e)})
+            await websocket.close(code=1003)
+            return
+        async for event in stream_action(
+            request.customerId, request.sellerId, request.productId
+        ):
+            await websocket.send_json(event)
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+
+
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """
+    Streams the receipt agent pipeline as Server-Sent Events: intermediate
+    stages, partial chatResponse text and the final response.
+    """
+
+    async def events():
+        async for event in stream_agent_chat(
+            [message.model_dump() for message in request.query],
+            request.userId,
+            request.sessionId,
+            request.earlyResponse,
+        ):
+            yield sse_event(event)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    """Status of the background pass and relevancy work of an early response."""
+    status = get_background_job(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return status
+
+
+@app.post("/chat/upload")
+async def chat_upload(
+    userId: str = Form(...),
+    sessionId: str | None = Form(None),
+    message: str | None = Form(None),
+    earlyResponse: bool = Form(False),
+    stream: bool = Form(False),
+    images: List[UploadFile] = File(default=[]),
+):
+    """
+    Receipt chat with the images sent as multipart binary instead of base64.
+    Uploads are spooled to disk past 1 MB while the request is parsed, and
+    their bytes go to the pipeline as they are. Requests over
+    MAX_UPLOAD_REQUEST_BYTES are refused by UploadSizeLimit, images over
+    MAX_UPLOAD_BYTES while they are read.
+    """
+    current_query = []
+    if message:
+        current_query.append({"message_type": "text", "content": message})
+    for image in images:
+        try:
+            current_query.append({"message_type": "img", "content": await read_upload(image)})
+        finally:
+            await image.close()
+
+    if not stream:
+        return await call_agent_chat(current_query, userId, sessionId, earlyResponse)
+
+    async def events():
+        async for event in stream_agent_chat(
+            current_query, userId, sessionId, earlyResponse
+        ):
+            yield sse_event(event)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
@@ -0,0 +1,174 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+from google.adk.events import Event, EventActions
+from google.adk.sessions import DatabaseSessionService
+from sqlalchemy import bindparam, event, text
+
+# events kept verbatim per session, older ones are folded into 'history_summary'
+MAX_SESSION_EVENTS = 40
+# sessions are only compacted once they grow this far past the cap
+COMPACTION_SLACK = 20
+SUMMARY_CHARS_PER_EVENT = 200
+SUMMARY_MAX_CHARS = 4000
+# idle sessions are deleted after this long
+SESSION_TTL = timedelta(days=30)
+MAINTENANCE_INTERVAL = 6 * 3600
+
+
+def _sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.execute("PRAGMA busy_timeout=5000")
+    cursor.close()
+
+
+def create_session_service(db_url: str) -> DatabaseSessionService:
+    """
+    Creates a DatabaseSessionService on a pooled engine. SQLite databases run in
+    WAL mode, so readers never wait for the writer of another chat.
+    """
+    if not db_url.startswith("sqlite"):
+        return DatabaseSessionService(db_url, pool_pre_ping=True)
+    service = DatabaseSessionService(
+        db_url,
+        pool_size=5,
+        max_overflow=10,
+        connect_args={"check_same_thread": False, "timeout": 30},
+    )
+    engine = getattr(service.db_engine, "sync_engine", service.db_engine)
+    event.listen(engine, "connect", _sqlite_pragmas)
+    # connections opened while the service created its tables predate the listener
+    engine.dispose()
+    return service
+
+
+class SessionStore:
+    """
+    Keeps a DatabaseSessionService bounded: sessions are capped at
+    max_events events with the older ones summarized into the
+    'history_summary' state value, idle sessions expire after ttl, and the
+    database is checkpointed and vacuumed in the background.
+    """
+
+    def __init__(
+        self,
+        service: DatabaseSessionService,
+        app_name: str,
+        max_events: int = MAX_SESSION_EVENTS,
+        ttl: timedelta = SESSION_TTL,
+    ):
+        self.service = service
+        self.app_name = app_name
+        self.max_events = max_events
+        self.ttl = ttl
+
+    async def execute(self, statement, params: dict | None = None, autocommit=False):
+        """
+        Runs SQL on the service's engine, returning rows for queries and the row
+        count otherwise. Statements like VACUUM need autocommit, outside a transaction.
+        """
+        engine = self.service.db_engine
+        options = {"isolation_level": "AUTOCOMMIT"} if autocommit else {}
+        if hasattr(engine, "sync_engine"):  # async engine
+            async with engine.connect() as conn:
+                conn = await conn.execution_options(**options)
+                result = await conn.execute(statement, params or {})
+                rows = result.fetchall() if result.returns_rows else result.rowcount
+                await conn.commit()
+                return rows
+
+        def run():
+            with engine.connect() as conn:
+                conn = conn.execution_options(**options)
+                result = conn.execute(statement, params or {})
+                rows = result.fetchall() if result.returns_rows else result.rowcount
+                conn.commit()
+                return rows
+
+        return await asyncio.to_thread(run)
+
+    async def compact(self, user_id: str, session_id: str):
+        """Summarizes and deletes the events of a session beyond max_events."""
+        keys = {"app_name": self.app_name, "user_id": user_id, "session_id": session_id}
+        rows = await self.execute(
+            text(
+                "SELECT COUNT(*) FROM events WHERE app_name = :app_name"
+                " AND user_id = :user_id AND session_id = :session_id"
+            ),
+            keys,
+        )
+        if rows[0][0] <= self.max_events + COMPACTION_SLACK:
+            return
+        session = await self.service.get_session(**keys)
+        if session is None:
+            return
+        old_events = session.events[: -self.max_events]
+
+        summary = [session.state.get("history_summary", "")]
+        for old_event in old_events:
+            parts = old_event.content.parts if old_event.content else None
+            texts = " ".join(part.text for part in parts or [] if part.text).strip()
+            if texts:
+                summary.append(f"{old_event.author}: {texts[:SUMMARY_CHARS_PER_EVENT]}")
+        await self.service.append_event(
+            session,
+            Event(
+                invocation_id=f"compaction-{int(time.time())}",
+                author="session_store",
+                actions=EventActions(
+                    state_delta={
+                        "history_summary": "\n".join(filter(None, summary))[
+                            -SUMMARY_MAX_CHARS:
+                        ]
+                    }
+                ),
+            ),
+        )
+        deleted = await self.execute(
+            text(
+                "DELETE FROM events WHERE app_name = :app_name AND user_id = :user_id"
+                " AND session_id = :session_id AND id IN :ids"
+            ).bindparams(bindparam("ids", expanding=True)),
+            {**keys, "ids": [old_event.id for old_event in old_events]},
+        )
+        print(f"  [Sessions] compacted {session_id}: {deleted} events summarized")
+
+    async def expire_idle(self) -> int:
+        """Deletes sessions that were not updated within ttl, returns how many."""
+        cutoff = {"app_name": self.app_name, "cutoff": datetime.now() - self.ttl}
+        await self.execute(
+            text(
+                "DELETE FROM events WHERE app_name = :app_name AND session_id IN"
+                " (SELECT id FROM sessions WHERE app_name = :app_name AND update_time < :cutoff)"
+            ),
+            cutoff,
+        )
+        return await self.execute(
+            text(
+                "DELETE FROM sessions WHERE app_name = :app_name AND update_time < :cutoff"
+            ),
+            cutoff,
+        )
+
+    async def vacuum(self):
+        """Checkpoints the WAL and gives free pages back to the file system."""
+        await self.execute(text("PRAGMA wal_checkpoint(TRUNCATE)"), autocommit=True)
+        await self.execute(text("VACUUM"), autocommit=True)
+
+    async def run_maintenance(self, interval: float = MAINTENANCE_INTERVAL):
+        """Expires idle sessions and vacuums the database every `interval` seconds."""
+        while True:
+            try:
+                expired = await self.expire_idle()
+                await self.vacuum()
+                print(f"  [Sessions] expired {expired} idle sessions, database vacuumed")
+            except Exception as e:
+                print(f"  [Sessions] maintenance failed: {e}")
+            await asyncio.sleep(interval)
+
+    def start(self, interval: float = MAINTENANCE_INTERVAL) -> asyncio.Task:
+        return asyncio.create_task(self.run_maintenance(interval))
@@ -0,0 +1,148 @@
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+
+@dataclass
+class NegotiationTerms:
+    """
+    Limits of both parties for one negotiation.
+    The seller opens at list_price and never goes below seller_floor, the
+    buyer opens at buyer_opening and never goes above buyer_ceiling.
+    """
+
+    list_price: float
+    seller_floor: float
+    buyer_opening: float
+    buyer_ceiling: float
+    max_rounds: int = 8
+
+    @classmethod
+    def from_limits(
+        cls,
+        list_price: float,
+        buyer_limit: float,
+        merchant_limit: float,
+        max_rounds: int = 8,
+    ) -> "NegotiationTerms":
+        """
+        Builds terms from the 'negotiationLimit' discount fractions stored on the
+        users. The merchant gives at most merchant_limit off the list price and
+        the buyer pays at most buyer_limit off it, opening at twice that
+        discount. A deal is only possible when merchant_limit >= buyer_limit.
+        Unlike the backend's process_transaction, which always settles at the
+        average of the two discounts, the agreed price depends on the strategy.
+        """
+        buyer_limit = min(max(buyer_limit, 0.0), 1.0)
+        merchant_limit = min(max(merchant_limit, 0.0), 1.0)
+        return cls(
+            list_price=list_price,
+            seller_floor=list_price * (1 - merchant_limit),
+            buyer_opening=list_price * max(1 - 2 * buyer_limit, 0.0),
+            buyer_ceiling=list_price * (1 - buyer_limit),
+            max_rounds=max_rounds,
+        )
+
+
+@dataclass
+class Offer:
+    party: str
+    price: float
+    turn: int
+
+
+@dataclass
+class Outcome:
+    strategy: str
+    agreed: bool
+    price: Optional[float]
+    offers: List[Offer] = field(default_factory=list)
+
+
+# a strategy returns the price `party` offers in round `turn` (0 based) given the
+# terms and the opponent's last offer
+Strategy = Callable[[str, int, NegotiationTerms, Optional[float]], float]
+
+
+def _bounds(party: str, terms: NegotiationTerms):
+    if party == "seller":
+        return terms.list_price, terms.seller_floor
+    return terms.buyer_opening, terms.buyer_ceiling
+
+
+def alternating_concessions(
+    party: str, turn: int, terms: NegotiationTerms, last_offer: Optional[float]
+) -> float:
+    """Each party concedes an equal share of its range every turn."""
+    opening, reservation = _bounds(party, terms)
+    step = min(turn / max(terms.max_rounds - 1, 1), 1.0)
+    return opening + (reservation - opening) * step
+
+
+def split_the_difference(
+    party: str, turn: int, terms: NegotiationTerms, last_offer: Optional[float]
+) -> float:
+    """Open at the own limit, then offer the midpoint of the two last offers."""
+    opening, reservation = _bounds(party, terms)
+    if last_offer is None or turn == 0:
+        return opening
+    midpoint = (opening + last_offer) / 2 if turn == 1 else last_offer
+    # never cross the own reservation price
+    if party == "seller":
+        return max(midpoint, reservation)
+    return min(midpoint, reservation)
+
+
+def time_decay(beta: float) -> Strategy:
+    """
+    Time-dependent concession towards the reservation price.
+    beta < 1 holds out until late (boulware), beta > 1 concedes early (conceder).
+    """
+
+    def strategy(
+        party: str, turn: int, terms: NegotiationTerms, last_offer: Optional[float]
+    ) -> float:
+        opening, reservation = _bounds(party, terms)
+        t = min(turn / max(terms.max_rounds - 1, 1), 1.0)
+        return opening + (reservation - opening) * t ** (1 / beta)
+
+    return strategy
+
+
+STRATEGIES: Dict[str, Strategy] = {
+    "alternating": alternating_concessions,
+    "split": split_the_difference,
+    "boulware": time_decay(0.5),
+    "conceder": time_decay(2.0),
+}
+
+
+def negotiate(terms: NegotiationTerms, strategy: str = "alternating") -> Outcome:
+    """
+    Plays a negotiation between the seller and the buyer without any model call.
+    The seller offers first; a party accepts as soon as the opponent's offer is at
+    least as good as the offer it would make next.
+    Args:
+        terms (NegotiationTerms): Limits of both parties.
+        strategy (str): Name of a strategy in STRATEGIES, used by both parties.
+    Returns:
+        Outcome: Whether a deal was reached, the agreed price and every offer made.
+    """
+    play = STRATEGIES[strategy]
+    outcome = Outcome(strategy=strategy, agreed=False, price=None)
+    if terms.seller_floor > terms.buyer_ceiling:
+        return outcome
+
+    last = {"seller": None, "buyer": None}
+    for turn in range(terms.max_rounds):
+        for party, opponent in (("seller", "buyer"), ("buyer", "seller")):
+            price = round(play(party, turn, terms, last[opponent]), 2)
+            offered = last[opponent]
+            if offered is not None and (
+                offered >= price if party == "seller" else offered <= price
+            ):
+                outcome.agreed = True
+                outcome.price = offered
+                return outcome
+            last[party] = price
+            outcome.offers.append(Offer(party=party, price=price, turn=turn))
+    return outcome
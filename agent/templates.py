@@ -0,0 +1,98 @@
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Dict, Optional, Tuple
+
+# spend of a user in the current day, week or month:
+# (user_id, period, now) -> {"total", "count", "top_vendor", "currency"} or None
+SpendProvider = Callable[[str, str, datetime], Optional[dict]]
+
+PERIOD_LABELS = {"day": "today", "week": "this week", "month": "this month"}
+
+EMPTY_PERIOD_TEXT = "{title}: no receipts recorded {period_label}."
+
+# reminders with one of these templates are filled in without the scheduler agent
+TEMPLATES: Dict[str, dict] = {
+    "daily_expense_total": {
+        "period": "day",
+        "text": "{title}: you spent {amount} {period_label} across {count} receipts.",
+    },
+    "weekly_expense_total": {
+        "period": "week",
+        "text": "{title}: you spent {amount} {period_label} across {count} receipts"
+        ", most of it at {top_vendor}.",
+    },
+    "monthly_expense_total": {
+        "period": "month",
+        "text": "{title}: you spent {amount} {period_label} across {count} receipts"
+        ", most of it at {top_vendor}.",
+    },
+}
+
+# rendered messages of recurring free-form reminders, which read the same every time they fire
+MESSAGE_CACHE_SIZE = 1024
+
+spend_provider: Optional[SpendProvider] = None
+
+
+def set_spend_provider(provider: SpendProvider):
+    """Registers where the expense templates read precomputed spend from."""
+    global spend_provider
+    spend_provider = provider
+
+
+def render_template(reminder: dict, now: datetime) -> Optional[str]:
+    """
+    Fills in the template of a reminder.
+    Args:
+        reminder (dict): The reminder, as stored in the ReminderStore.
+        now (datetime): The time the reminder fires.
+    Returns:
+        Optional[str]: The message, None if the reminder has no template or its data is unavailable.
+    """
+    template = TEMPLATES.get(reminder.get("template") or "")
+    if template is None or spend_provider is None:
+        return None
+    spend = spend_provider(reminder["user_id"], template["period"], now)
+    if spend is None:
+        return None
+    text = template["text"] if spend.get("count") else EMPTY_PERIOD_TEXT
+    amount = f"{spend.get('total', 0.0):.2f} {spend.get('currency', '')}".strip()
+    return text.format(
+        title=reminder["title"],
+        period_label=PERIOD_LABELS[template["period"]],
+        amount=amount,
+        count=spend.get("count", 0),
+        top_vendor=spend.get("top_vendor", "various vendors"),
+    )
+
+
+class MessageCache:
+    """
+    LRU cache of scheduler agent messages for recurring reminders. Keys
+    include the reminder's text, so editing a reminder renders it again.
+    """
+
+    def __init__(self, max_entries: int = MESSAGE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[Tuple[str, ...], str]" = OrderedDict()
+
+    def _key(self, reminder: dict) -> Tuple[str, ...]:
+        return (reminder["id"], reminder["title"], reminder["message"], reminder["repeat"])
+
+    def get(self, reminder: dict) -> Optional[str]:
+        key = self._key(reminder)
+        message = self.entries.get(key)
+        if message is not None:
+            self.entries.move_to_end(key)
+        return message
+
+    def store(self, reminder: dict, message: str):
+        if reminder["repeat"] == "none":
+            return
+        self.entries[self._key(reminder)] = message
+        self.entries.move_to_end(self._key(reminder))
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+
+message_cache = MessageCache()
@@ -1,7 +1,35 @@
-from agent.tools.relevancy import get_relevant_context, put_relevent_data
-from agent.tools.extraction import add_reciept_data, delete_reciept_data
-from agent.tools.passes import (
-    insert_pass_object_string,
-    update_pass_object_string,
-)
-from agent.tools.bargain import *
+import importlib
+
+# tool functions re-exported from their modules, imported on first use so
+# loading one tool module does not connect every backend the others need
+_TOOL_MODULES = {
+    "get_relevant_context": "agent.tools.relevancy",
+    "put_relevent_data": "agent.tools.relevancy",
+    "add_reciept_data": "agent.tools.extraction",
+    "delete_reciept_data": "agent.tools.extraction",
+    "get_spend_summary": "agent.tools.extraction",
+    "insert_pass_object_string": "agent.tools.passes",
+    "insert_pass_objects": "agent.tools.passes",
+    "update_pass_object_string": "agent.tools.passes",
+    "add_reminder_data": "agent.tools.reminder",
+    "update_reminder_data": "agent.tools.reminder",
+    "delete_remainder_data": "agent.tools.reminder",
+    "get_balance": "agent.tools.bargain",
+    "send_money": "agent.tools.bargain",
+    "get_money": "agent.tools.bargain",
+    "get_inventory": "agent.tools.bargain",
+    "add_inventory": "agent.tools.bargain",
+    "reduce_in_inventry": "agent.tools.bargain",
+    "buy_item_from_seller": "agent.tools.bargain",
+    "buy_items_from_seller": "agent.tools.bargain",
+}
+
+__all__ = list(_TOOL_MODULES)
+
+
+def __getattr__(name: str):
+    if name not in _TOOL_MODULES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_TOOL_MODULES[name]), name)
+    globals()[name] = value
+    return value
@@ -0,0 +1,279 @@
+from typing import List
+from google.cloud import firestore
+
+# Async Firestore client, created on first use so it binds to the running event loop
+_db = None
+
+
+def get_db() -> firestore.AsyncClient:
+    global _db
+    if _db is None:
+        _db = firestore.AsyncClient("agenticai")
+    return _db
+
+
+async def get_balance(user_id: str) -> float:
+    """
+    this function is used to retrieve the balance for a user
+    Args:
+        user_id (str): The ID of the user.
+    Returns:
+        float: The balance of the user.
+    """
+    try:
+        query = get_db().collection("users").where("user_id", "==", user_id).limit(1)
+        async for doc in query.stream():
+            return doc.to_dict().get("balance", 0.0)
+        return 0.0
+    except Exception as e:
+        return 0.0
+
+
+async def _first_user_doc(transaction, user_id: str):
+    query = get_db().collection("users").where("user_id", "==", user_id).limit(1)
+    async for doc in await transaction.get(query):
+        return doc
+    return None
+
+
+@firestore.async_transactional
+async def _transfer_money(transaction, sender_id: str, receiver_id: str, amount: float) -> bool:
+    # both balances are read in the transaction, so a concurrent transfer makes it retry
+    sender_doc = await _first_user_doc(transaction, sender_id)
+    receiver_doc = await _first_user_doc(transaction, receiver_id)
+    if sender_doc is None or receiver_doc is None:
+        return False
+
+    sender_balance = sender_doc.to_dict().get("balance", 0.0)
+    receiver_balance = receiver_doc.to_dict().get("balance", 0.0)
+    if sender_balance < amount:
+        return False
+
+    transaction.update(sender_doc.reference, {"balance": sender_balance - amount})
+    transaction.update(receiver_doc.reference, {"balance": receiver_balance + amount})
+    return True
+
+
+async def send_money(sender_id: str, receiver_id: str, amount: float) -> bool:
+    """
+    This function sends money from sender to receiver.
+    Both balances are checked and updated in a single transaction.
+    Args:
+        sender_id (str): The ID of the sender user.
+        receiver_id (str): The ID of the recipient user.
+        amount (float): The amount to send.
+    Returns:
+        bool: True if the transaction was successful, False otherwise.
+    """
+    try:
+        return await _transfer_money(get_db().transaction(), sender_id, receiver_id, amount)
+    except Exception as e:
+        return False
+
+
+async def get_money(sender_id: str, user_id: str, amount: float):
+    """
+    This function allows a user to receive money from a sender.
+    Args:
+        sender_id (str): The ID of the sender user.
+        user_id (str): The ID of the recipient user.
+        amount (float): The amount to receive.
+    Returns:
+        bool: True if the transaction was successful, False otherwise.
+    """
+    return await send_money(sender_id, user_id, amount)
+
+
+async def get_inventory(user_id: str, items: list, quantity: int):
+    """
+    This function retrieves inventory items for a user.
+    Args:
+        user_id (str): The ID of the user.
+        items (list): List of item names to retrieve.
+        quantity (int): Minimum quantity to filter items.
+    Returns:
+        list: List of inventory items matching criteria.
+    """
+    try:
+        query = get_db().collection("inventory").where("user_id", "==", user_id)
+        result = []
+        async for doc in query.stream():
+            data = doc.to_dict()
+            if data.get("item") in items and data.get("quantity", 0) >= quantity:
+                result.append(data)
+        return result
+    except Exception as e:
+        return []
+
+
+async def get_item_cost(user_id: str, product_id: str) -> float:
+    """
+    This function retrieves the listed cost of a product in a user's inventory.
+    Args:
+        user_id (str): The ID of the user.
+        product_id (str): The product ID.
+    Returns:
+        float: The cost of the product, 0.0 if it is not listed.
+    """
+    try:
+        query = (
+            get_db().collection("inventory")
+            .where("user_id", "==", user_id)
+            .where("product_id", "==", product_id)
+            .limit(1)
+        )
+        async for doc in query.stream():
+            return float(doc.to_dict().get("cost", 0.0))
+        return 0.0
+    except Exception as e:
+        return 0.0
+
+
+async def add_inventory(
+    user_id: str, cost: int, quantity: int, product_id: str, product: str
+):
+    """
+    This function adds a new inventory item for a user.
+    Args:
+        user_id (str): The ID of the user.
+        cost (int): The cost of the item.
+        quantity (int): The quantity of the item.
+        product_id (str): The product ID.
+        product (str): The name of the product.
+    Returns:
+        bool: True if the item was added successfully, False otherwise.
+    """
+    try:
+        await get_db().collection("inventory").add(
+            {
+                "user_id": user_id,
+                "cost": cost,
+                "quantity": quantity,
+                "product_id": product_id,
+                "item": product,
+            }
+        )
+        return True
+    except Exception as e:
+        return False
+
+
+async def reduce_in_inventry(user_id: str, product_id: str, quantity: int) -> bool:
+    """
+    Reduces the quantity of a product in a user's inventory.
+    Args:
+        user_id (str): The ID of the user.
+        product_id (str): The product ID.
+        quantity (int): The quantity to reduce.
+    Returns:
+        bool: True if reduction was successful, False otherwise.
+    """
+    try:
+        query = (
+            get_db().collection("inventory")
+            .where("user_id", "==", user_id)
+            .where("product_id", "==", product_id)
+            .limit(1)
+        )
+        async for doc in query.stream():
+            current_quantity = doc.to_dict().get("quantity", 0)
+            if current_quantity < quantity:
+                return False
+            await doc.reference.update({"quantity": current_quantity - quantity})
+            return True
+        return False
+    except Exception as e:
+        return False
+
+
+async def _inventory_by_product(transaction, user_id: str, product_ids: list) -> dict:
+    inventory_ref = get_db().collection("inventory")
+    docs = {}
+    unique_ids = list(dict.fromkeys(product_ids))
+    # 'in' filters accept at most 30 values per query
+    for start in range(0, len(unique_ids), 30):
+        query = inventory_ref.where("user_id", "==", user_id).where(
+            "product_id", "in", unique_ids[start : start + 30]
+        )
+        async for doc in await transaction.get(query):
+            docs.setdefault(doc.to_dict().get("product_id"), doc)
+    return docs
+
+
+@firestore.async_transactional
+async def _transfer_items(transaction, seller_id: str, cust_id: str, purchases: dict):
+    # --- 1. Read seller and buyer inventory before any write ---
+    product_ids = list(purchases)
+    seller_docs = await _inventory_by_product(transaction, seller_id, product_ids)
+    cust_docs = await _inventory_by_product(transaction, cust_id, product_ids)
+
+    # --- 2. Validate stock for every item ---
+    for product_id, quantity in purchases.items():
+        seller_doc = seller_docs.get(product_id)
+        if seller_doc is None or seller_doc.to_dict().get("quantity", 0) < quantity:
+            return False
+
+    # --- 3. Stage all writes, committed together with the transaction ---
+    inventory_ref = get_db().collection("inventory")
+    for product_id, quantity in purchases.items():
+        seller_doc = seller_docs[product_id]
+        transaction.update(
+            seller_doc.reference,
+            {"quantity": seller_doc.to_dict().get("quantity", 0) - quantity},
+        )
+        cust_doc = cust_docs.get(product_id)
+        if cust_doc is None:
+            transaction.set(
+                inventory_ref.document(),
+                {"user_id": cust_id, "product_id": product_id, "quantity": quantity},
+            )
+        else:
+            transaction.update(
+                cust_doc.reference,
+                {"quantity": cust_doc.to_dict().get("quantity", 0) + quantity},
+            )
+    return True
+
+
+async def buy_item_from_seller(
+    seller_id: str, cust_id: str, product_id: str, quantity: int
+) -> bool:
+    """
+    Handles the purchase of an item from a seller by a customer.
+    The seller's stock is reduced and the customer's inventory is increased in a single transaction.
+    Args:
+        seller_id (str): The ID of the seller.
+        cust_id (str): The ID of the customer.
+        product_id (str): The product ID.
+        quantity (int): The quantity to buy.
+    Returns:
+        bool: True if the purchase was successful, False otherwise.
+    """
+    return await buy_items_from_seller(seller_id, cust_id, [product_id], [quantity])
+
+
+async def buy_items_from_seller(
+    seller_id: str, cust_id: str, product_ids: List[str], quantities: List[int]
+) -> bool:
+    """
+    Handles the purchase of several items from a seller by a customer in a single transaction.
+    Either every item is transferred or nothing is.
+    Args:
+        seller_id (str): The ID of the seller.
+        cust_id (str): The ID of the customer.
+        product_ids (List[str]): The product IDs to buy.
+        quantities (List[int]): The quantity to buy for each product, in the same order.
+    Returns:
+        bool: True if the purchase was successful, False otherwise.
+    """
+    if not product_ids or len(product_ids) != len(quantities):
+        return False
+    purchases = {}
+    for product_id, quantity in zip(product_ids, quantities):
+        if quantity <= 0:
+            return False
+        purchases[product_id] = purchases.get(product_id, 0) + quantity
+    try:
+        return await _transfer_items(get_db().transaction(), seller_id, cust_id, purchases)
+    except Exception as e:
+        return False
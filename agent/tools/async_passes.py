@@ -0,0 +1,224 @@
+import json
+from contextvars import ContextVar
+from typing import List, Optional
+from google.cloud import firestore
+
+from agent.tools.passes import get_pass_object_string
+from agent.tools.wallet_sync import (
+    SYNC_IN_PROGRESS_OR_DONE,
+    content_hash,
+    enqueue_wallet_sync,
+    pending_sync_state,
+)
+
+# Async Firestore client, created on first use so it binds to the running event loop
+_db = None
+
+
+def get_db() -> firestore.AsyncClient:
+    global _db
+    if _db is None:
+        _db = firestore.AsyncClient()
+    return _db
+
+
+# a Firestore batch takes at most 500 writes, and a run's passes go in one batch
+BATCH_MAX_WRITES = 500
+
+BATCH_FULL_MESSAGE = f"cannot write more than {BATCH_MAX_WRITES} passes at once"
+
+
+class PassBatch:
+    """
+    Pass writes of one agent run, committed together. Document IDs are
+    generated client side, so inserts return their ID as soon as they are
+    staged. With a run_id the IDs are derived from it instead of random, so a
+    retried run overwrites the passes of its earlier attempt rather than
+    duplicating them. Wallet syncs are queued after the commit, once the
+    passes they read exist. At most BATCH_MAX_WRITES writes are staged, so
+    the commit is a single atomic batch.
+    """
+
+    def __init__(self, run_id: Optional[str] = None):
+        self.run_id = run_id
+        self.inserted = 0
+        self.writes = []
+
+    def has_room(self, writes: int = 1) -> bool:
+        return len(self.writes) + writes <= BATCH_MAX_WRITES
+
+    def insert(self, object_string: str, type: str) -> str:
+        if self.run_id:
+            doc_ref = get_db().collection("passes").document(f"{self.run_id}-{self.inserted}")
+        else:
+            doc_ref = get_db().collection("passes").document()
+        self.inserted += 1
+        self.writes.append((doc_ref, _insert_fields(object_string, type), False))
+        return doc_ref.id
+
+    def update(self, object_id: str, fields: dict):
+        self.writes.append((get_db().collection("passes").document(object_id), fields, True))
+
+    async def commit(self) -> List[dict]:
+        """
+        Writes every staged pass in one batch and queues the Wallet syncs of
+        the updated ones.
+        Returns:
+            List[dict]: object_id, action and, for updates, status and
+                sync_job_id of each write, in the order they were staged.
+        """
+        if not self.writes:
+            return []
+        batch = get_db().batch()
+        for doc_ref, fields, merge in self.writes:
+            batch.set(doc_ref, fields, merge=merge)
+        await batch.commit()
+        print(f"  [Passes] committed {len(self.writes)} pass writes in one batch")
+
+        results = []
+        for doc_ref, _, merge in self.writes:
+            if merge:
+                results.append({
+                    "object_id": doc_ref.id,
+                    "action": "updated",
+                    "status": "updated_sync_queued",
+                    "sync_job_id": enqueue_wallet_sync(doc_ref.id),
+                })
+            else:
+                results.append({"object_id": doc_ref.id, "action": "inserted"})
+        self.writes = []
+        return results
+
+
+# pass writes of the agent run the current task is running, see collect_passes
+current_pass_batch: ContextVar[Optional[PassBatch]] = ContextVar(
+    "current_pass_batch", default=None
+)
+
+
+def collect_passes(run_id: Optional[str] = None) -> PassBatch:
+    """Stages the pass tools' writes of the current agent run instead of writing them one by one."""
+    pass_batch = PassBatch(run_id)
+    current_pass_batch.set(pass_batch)
+    return pass_batch
+
+
+async def commit_passes() -> List[dict]:
+    """Commits the passes collected for the current agent run and stops collecting."""
+    pass_batch = current_pass_batch.get()
+    current_pass_batch.set(None)
+    return await pass_batch.commit() if pass_batch else []
+
+
+def discard_passes():
+    """Drops the passes collected for a run that failed, nothing of it is written."""
+    current_pass_batch.set(None)
+
+
+def _insert_fields(object_string: str, type: str) -> dict:
+    return {
+        "object": object_string,
+        "type": type,
+        "content_hash": content_hash(object_string),
+        "updated_at": firestore.SERVER_TIMESTAMP
+    }
+
+
+async def insert_pass_object_string(object_string: str, type: str) -> str:
+    """
+    Inserts a new pass object string into Firestore under the 'passes' collection.
+
+    Args:
+        object_string (str): JSON string representing the pass object (reminder or receipt).
+        type (str): Type of pass, should be either "receipt" or "reminder".
+
+    Returns:
+        str: Auto-generated Firestore document ID where the object is stored.
+    """
+    pass_batch = current_pass_batch.get()
+    if pass_batch is not None:
+        if not pass_batch.has_room():
+            return BATCH_FULL_MESSAGE
+        return pass_batch.insert(object_string, type)
+    doc_ref = get_db().collection("passes").document()
+    await doc_ref.set(_insert_fields(object_string, type))
+    return doc_ref.id
+
+
+async def insert_pass_objects(object_strings: List[str], types: List[str]) -> List[str]:
+    """
+    Inserts several pass object strings into Firestore at once, like a receipt pass together with its reminder passes.
+
+    Args:
+        object_strings (List[str]): JSON strings of the pass objects.
+        types (List[str]): Type of each pass, either "receipt" or "reminder".
+
+    Returns:
+        List[str]: Auto-generated Firestore document IDs, in the order of the objects,
+            or a message describing why nothing was inserted.
+    """
+    if len(object_strings) != len(types):
+        return f"got {len(object_strings)} object strings but {len(types)} types, send one type per object"
+    pass_batch = current_pass_batch.get() or PassBatch()
+    if not pass_batch.has_room(len(object_strings)):
+        return BATCH_FULL_MESSAGE
+    object_ids = [
+        pass_batch.insert(object_string, type)
+        for object_string, type in zip(object_strings, types)
+    ]
+    if pass_batch is not current_pass_batch.get():
+        await pass_batch.commit()
+    return object_ids
+
+
+async def update_pass_object_string(object_id: str, object_dict: dict, type: str) -> dict:
+    """
+    Updates a pass object in Firestore and queues its sync with the Google Wallet API.
+    The sync runs on the background job queue; its progress is kept on the
+    pass under "wallet_sync".
+
+    Args:
+        object_id (str): Firestore document ID of the pass to update.
+        object_dict (dict): The new pass object as a dictionary (not stringified).
+        type (str): Type of pass ("receipt" or "reminder").
+
+    Returns:
+        dict: Status of the operation with object ID and the ID of the sync job,
+            or status "unchanged" when the pass already holds this object, or
+            "update_staged" when the write is part of the current run's batch;
+            the run reports the final status once the batch is committed.
+    """
+    object_hash = content_hash(object_dict)
+    doc_ref = get_db().collection("passes").document(object_id)
+
+    # repeated agent runs often send the pass unchanged, which needs no writes at all,
+    # unless its last Wallet sync failed and sending it again is the retry
+    snapshot = await doc_ref.get()
+    stored = snapshot.to_dict() or {}
+    if (
+        stored.get("content_hash") == object_hash
+        and stored.get("wallet_sync", {}).get("status") in SYNC_IN_PROGRESS_OR_DONE
+    ):
+        return {"status": "unchanged", "object_id": object_id}
+
+    fields = {
+        "object": json.dumps(object_dict, indent=2),
+        "type": type,
+        "content_hash": object_hash,
+        "updated_at": firestore.SERVER_TIMESTAMP,
+        "wallet_sync": pending_sync_state(),
+    }
+    pass_batch = current_pass_batch.get()
+    if pass_batch is not None:
+        if not pass_batch.has_room():
+            return {"status": "failed", "error": BATCH_FULL_MESSAGE, "object_id": object_id}
+        # written and synced when the agent run commits its passes
+        pass_batch.update(object_id, fields)
+        return {"status": "update_staged", "object_id": object_id}
+
+    # Save to Firestore, merged to keep the last synced object the Wallet diff is based on
+    await doc_ref.set(fields, merge=True)
+
+    # Google Wallet is updated in the background
+    job_id = enqueue_wallet_sync(object_id)
+    return {"status": "updated_sync_queued", "object_id": object_id, "sync_job_id": job_id}
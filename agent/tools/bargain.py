@@ -1,6 +1,6 @@
 import json
 import requests
-from typing import Literal
+from typing import List, Literal
 from google.cloud import firestore
 from google.oauth2 import service_account
 from google.auth.transport.requests import Request
@@ -30,9 +30,35 @@ def get_balance(user_id: str) -> float:
         return 0.0
 
 
+def _first_user_doc(transaction, user_id: str):
+    query = db.collection("users").where("user_id", "==", user_id).limit(1)
+    for doc in transaction.get(query):
+        return doc
+    return None
+
+
+@firestore.transactional
+def _transfer_money(transaction, sender_id: str, receiver_id: str, amount: float) -> bool:
+    # both balances are read in the transaction, so a concurrent transfer makes it retry
+    sender_doc = _first_user_doc(transaction, sender_id)
+    receiver_doc = _first_user_doc(transaction, receiver_id)
+    if sender_doc is None or receiver_doc is None:
+        return False
+
+    sender_balance = sender_doc.to_dict().get("balance", 0.0)
+    receiver_balance = receiver_doc.to_dict().get("balance", 0.0)
+    if sender_balance < amount:
+        return False
+
+    transaction.update(sender_doc.reference, {"balance": sender_balance - amount})
+    transaction.update(receiver_doc.reference, {"balance": receiver_balance + amount})
+    return True
+
+
 def send_money(sender_id: str, receiver_id: str, amount: float) -> bool:
     """
     This function sends money from sender to receiver.
+    Both balances are checked and updated in a single transaction.
     Args:
         sender_id (str): The ID of the sender user.
         receiver_id (str): The ID of the recipient user.
@@ -41,31 +67,7 @@ def send_money(sender_id: str, receiver_id: str, amount: float) -> bool:
         bool: True if the transaction was successful, False otherwise.
     """
     try:
-        users_ref = db.collection("users")
-        sender_query = users_ref.where("user_id", "==", sender_id).limit(1).stream()
-        receiver_query = users_ref.where("user_id", "==", receiver_id).limit(1).stream()
-
-        sender_doc = next(sender_query, None)
-        receiver_doc = next(receiver_query, None)
-
-        if sender_doc is None or receiver_doc is None:
-            return False
-
-        sender_data = sender_doc.to_dict()
-        receiver_data = receiver_doc.to_dict()
-
-        if sender_data.get("balance", 0.0) < amount:
-            return False
-
-        # Update balances
-        users_ref.document(sender_doc.id).update(
-            {"balance": sender_data["balance"] - amount}
-        )
-        users_ref.document(receiver_doc.id).update(
-            {"balance": receiver_data["balance"] + amount}
-        )
-
-        return True
+        return _transfer_money(db.transaction(), sender_id, receiver_id, amount)
     except Exception as e:
         return False
 
@@ -80,34 +82,7 @@ def get_money(sender_id: str, user_id: str, amount: float):
     Returns:
         bool: True if the transaction was successful, False otherwise.
     """
-    try:
-        users_ref = db.collection("users")
-        sender_query = users_ref.where("user_id", "==", sender_id).limit(1).stream()
-        receiver_query = users_ref.where("user_id", "==", user_id).limit(1).stream()
-
-        sender_doc = next(sender_query, None)
-        receiver_doc = next(receiver_query, None)
-
-        if sender_doc is None or receiver_doc is None:
-            return False
-
-        sender_data = sender_doc.to_dict()
-        receiver_data = receiver_doc.to_dict()
-
-        if sender_data.get("balance", 0.0) < amount:
-            return False
-
-        # Update balances
-        users_ref.document(sender_doc.id).update(
-            {"balance": sender_data["balance"] - amount}
-        )
-        users_ref.document(receiver_doc.id).update(
-            {"balance": receiver_data["balance"] + amount}
-        )
-
-        return True
-    except Exception as e:
-        return False
+    return send_money(sender_id, user_id, amount)
 
 
 def get_inventory(user_id: str, items: list, quantity: int):
@@ -195,11 +170,70 @@ def reduce_in_inventry(user_id: str, product_id: str, quantity: int) -> bool:
         return False
 
 
+def _inventory_by_product(transaction, user_id: str, product_ids: list) -> dict:
+    """
+    Reads a user's inventory documents for the given products inside a transaction.
+    Args:
+        transaction: The active Firestore transaction.
+        user_id (str): The ID of the user.
+        product_ids (list): Product IDs to read.
+    Returns:
+        dict: Mapping of product_id to its inventory document snapshot.
+    """
+    inventory_ref = db.collection("inventory")
+    docs = {}
+    unique_ids = list(dict.fromkeys(product_ids))
+    # 'in' filters accept at most 30 values per query
+    for start in range(0, len(unique_ids), 30):
+        query = inventory_ref.where("user_id", "==", user_id).where(
+            "product_id", "in", unique_ids[start : start + 30]
+        )
+        for doc in transaction.get(query):
+            docs.setdefault(doc.to_dict().get("product_id"), doc)
+    return docs
+
+
+@firestore.transactional
+def _transfer_items(transaction, seller_id: str, cust_id: str, purchases: dict):
+    # --- 1. Read seller and buyer inventory before any write ---
+    product_ids = list(purchases)
+    seller_docs = _inventory_by_product(transaction, seller_id, product_ids)
+    cust_docs = _inventory_by_product(transaction, cust_id, product_ids)
+
+    # --- 2. Validate stock for every item ---
+    for product_id, quantity in purchases.items():
+        seller_doc = seller_docs.get(product_id)
+        if seller_doc is None or seller_doc.to_dict().get("quantity", 0) < quantity:
+            return False
+
+    # --- 3. Stage all writes, committed together with the transaction ---
+    inventory_ref = db.collection("inventory")
+    for product_id, quantity in purchases.items():
+        seller_doc = seller_docs[product_id]
+        transaction.update(
+            seller_doc.reference,
+            {"quantity": seller_doc.to_dict().get("quantity", 0) - quantity},
+        )
+        cust_doc = cust_docs.get(product_id)
+        if cust_doc is None:
+            transaction.set(
+                inventory_ref.document(),
+                {"user_id": cust_id, "product_id": product_id, "quantity": quantity},
+            )
+        else:
+            transaction.update(
+                cust_doc.reference,
+                {"quantity": cust_doc.to_dict().get("quantity", 0) + quantity},
+            )
+    return True
+
+
 def buy_item_from_seller(
     seller_id: str, cust_id: str, product_id: str, quantity: int
 ) -> bool:
     """
     Handles the purchase of an item from a seller by a customer.
+    The seller's stock is reduced and the customer's inventory is increased in a single transaction.
     Args:
         seller_id (str): The ID of the seller.
         cust_id (str): The ID of the customer.
@@ -208,32 +242,31 @@ def buy_item_from_seller(
     Returns:
         bool: True if the purchase was successful, False otherwise.
     """
-    # Reduce inventory from seller
-    if not reduce_in_inventry(seller_id, product_id, quantity):
-        return False
+    return buy_items_from_seller(seller_id, cust_id, [product_id], [quantity])
 
-    # Add item to customer's inventory
-    try:
-        inventory_ref = db.collection("inventory")
-        query = (
-            inventory_ref.where("user_id", "==", cust_id)
-            .where("product_id", "==", product_id)
-            .limit(1)
-            .stream()
-        )
-        doc = next(query, None)
-        if doc is None:
-            # If customer doesn't have the product, create a new inventory entry
-            inventory_ref.add(
-                {"user_id": cust_id, "product_id": product_id, "quantity": quantity}
-            )
-        else:
-            # If customer already has the product, update the quantity
-            data = doc.to_dict()
-            current_quantity = data.get("quantity", 0)
-            new_quantity = current_quantity + quantity
-            inventory_ref.document(doc.id).update({"quantity": new_quantity})
 
-        return True
+def buy_items_from_seller(
+    seller_id: str, cust_id: str, product_ids: List[str], quantities: List[int]
+) -> bool:
+    """
+    Handles the purchase of several items from a seller by a customer in a single transaction.
+    Either every item is transferred or nothing is.
+    Args:
+        seller_id (str): The ID of the seller.
+        cust_id (str): The ID of the customer.
+        product_ids (List[str]): The product IDs to buy.
+        quantities (List[int]): The quantity to buy for each product, in the same order.
+    Returns:
+        bool: True if the purchase was successful, False otherwise.
+    """
+    if not product_ids or len(product_ids) != len(quantities):
+        return False
+    purchases = {}
+    for product_id, quantity in zip(product_ids, quantities):
+        if quantity <= 0:
+            return False
+        purchases[product_id] = purchases.get(product_id, 0) + quantity
+    try:
+        return _transfer_items(db.transaction(), seller_id, cust_id, purchases)
     except Exception as e:
         return False
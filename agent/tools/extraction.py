@@ -1,6 +1,147 @@
-from typing import List, Optional
-from datetime import datetime
-from modals import Receipt, ReceiptItemData
+import re
+from typing import Dict, List, Optional, Union
+from datetime import datetime, timezone
+from google.cloud import firestore
+
+from agent.templates import set_spend_provider
+
+# Firestore client
+db = firestore.Client()
+
+# a Firestore batch takes at most 500 writes
+BATCH_MAX_WRITES = 500
+
+PERIODS = ("day", "week", "month", "all")
+
+
+def _key(name: str) -> str:
+    # vendor and category names become map keys in field paths
+    return "".join(c if c.isalnum() else "_" for c in name.strip().lower()) or "unknown"
+
+
+def _bucket_id(period: str, date: datetime) -> str:
+    if period == "day":
+        return f"day-{date:%Y-%m-%d}"
+    if period == "week":
+        year, week, _ = date.isocalendar()
+        return f"week-{year}-W{week:02d}"
+    if period == "month":
+        return f"month-{date:%Y-%m}"
+    return "all"
+
+
+def _spend_ref(user_id: str, bucket_id: str):
+    return db.collection("users").document(user_id).collection("spend").document(bucket_id)
+
+
+def _parse_amount(value: Union[str, float, int, None]) -> float:
+    """Reads amounts the model writes like '1,200', '₹450' or '$ 12.50'."""
+    if value is None or isinstance(value, (int, float)):
+        return float(value or 0)
+    number = re.sub(r"[^\d.\-]", "", value.replace(",", ""))
+    if not number:
+        raise ValueError(f"'{value}' is not an amount")
+    return float(number)
+
+
+def _utc(date: datetime) -> datetime:
+    """Naive UTC time of a date, naive dates are taken as local time."""
+    return date.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _parse_date(date: Optional[str]) -> datetime:
+    """
+    Receipt dates as naive UTC, the way Firestore hands them back, so the
+    rollups are bucketed the same on insert, delete and lookup. Dates
+    without an offset are taken as local time, like the current time the
+    lookups bucket, so both sides land in the same day, week and month.
+    """
+    if not date:
+        return _utc(datetime.now())
+    return _utc(datetime.fromisoformat(date.strip().replace("Z", "+00:00")))
+
+
+def _rollup_ids(receipt: dict) -> List[str]:
+    """Every rollup document a receipt counts towards."""
+    date = receipt["date"]
+    return [_bucket_id(period, date) for period in PERIODS] + [
+        f"vendor-{_key(receipt['vendor'])}",
+        f"category-{_key(receipt['category'])}",
+    ]
+
+
+def _stage_rollups(batch, user_id: str, receipt: dict, sign: int):
+    """Adds (sign=1) or removes (sign=-1) a receipt from its rollups in batch."""
+    amount = sign * receipt["total"]
+    for bucket_id in receipt["rollup_ids"]:
+        batch.set(
+            _spend_ref(user_id, bucket_id),
+            {
+                "total": firestore.Increment(amount),
+                "count": firestore.Increment(sign),
+                "vendors": {_key(receipt["vendor"]): firestore.Increment(amount)},
+                "vendor_names": {_key(receipt["vendor"]): receipt["vendor"]},
+                "categories": {_key(receipt["category"]): firestore.Increment(amount)},
+                "updated_at": firestore.SERVER_TIMESTAMP,
+            },
+            merge=True,
+        )
+
+
+def _receipt_record(
+    vendor: str,
+    total: str,
+    tax: float,
+    date: Optional[str],
+    item_names: List[str],
+    item_costs: List[float],
+    item_quantities: List[int],
+    category: str = "other",
+    additional_items_data: Optional[str] = "{}",
+    additional_data: Optional[str] = "{}",
+) -> dict:
+    receipt = {
+        "vendor": vendor or "Unknown",
+        "category": category or "other",
+        "total": _parse_amount(total),
+        "tax": _parse_amount(tax),
+        "date": _parse_date(date),
+        "items": [
+            {"name": name, "cost": cost, "quantity": quantity}
+            for name, cost, quantity in zip(item_names, item_costs, item_quantities)
+        ],
+        "additional_items_data": additional_items_data or "{}",
+        "additional_data": additional_data or "{}",
+    }
+    # kept on the receipt, so a delete reverses exactly the rollups the insert touched
+    receipt["rollup_ids"] = _rollup_ids(receipt)
+    return receipt
+
+
+def write_receipts(user_id: str, receipts: List[dict]) -> List[str]:
+    """
+    Stores receipts of a user together with their rollup increments, in as
+    few batches as the Firestore batch size allows. A receipt and its
+    rollups always go in the same batch, so the totals never drift.
+    Args:
+        user_id (str): The ID of the user.
+        receipts (List[dict]): Receipts built by _receipt_record.
+    Returns:
+        List[str]: The IDs of the created receipts, in order.
+    """
+    writes_per_receipt = 1 + len(PERIODS) + 2
+    receipts_per_batch = BATCH_MAX_WRITES // writes_per_receipt
+    receipts_ref = db.collection("users").document(user_id).collection("receipts")
+    receipt_ids = []
+    for start in range(0, len(receipts), receipts_per_batch):
+        batch = db.batch()
+        for receipt in receipts[start : start + receipts_per_batch]:
+            doc_ref = receipts_ref.document()
+            batch.set(doc_ref, {**receipt, "created_at": firestore.SERVER_TIMESTAMP})
+            _stage_rollups(batch, user_id, receipt, 1)
+            receipt_ids.append(doc_ref.id)
+        batch.commit()
+    return receipt_ids
 
 
 def add_reciept_data(
@@ -8,10 +149,11 @@ def add_reciept_data(
     vendor: str,
     total: str,
     tax: float,
-    date: Optional[datetime],
+    date: Optional[str],
     item_names: List[str],
     item_costs: List[float],
     item_quantities: List[int],
+    category: str = "other",
     additional_items_data: Optional[str] = "{}",
     additional_data: Optional[str] = "{}",
 ) -> str:
@@ -22,16 +164,52 @@ def add_reciept_data(
         vendor (str): The vendor of the receipt, if not provided, it will be set to "Unknown".
         total (str): The total amount of the receipt.
         tax (float): The tax amount of the receipt, if no tax set to 0
-        date (Optional[datetime]): The date of the receipt.
+        date (Optional[str]): The date of the receipt in ISO format (YYYY-MM-DDTHH:MM:SS).
         item_names (List[ReceiptItem]): List of items in the receipt.
         item_costs (List[float]): List of costs for each item.
         item_quantities (List[int]): List of quantities for each item.
+        category (str): Spending category like 'groceries', 'dining', 'travel', default is "other".
         additional_items_data (Optional[str]): Additional data for the items, default is "{}".
         additional_data (Optional[str]): Additional data for the receipt, default is "{}".
     Returns:
-        str: The ID of the created receipt.
+        str: The ID of the created receipt, or a message describing why it was not stored.
     """
-    return
+    try:
+        receipt = _receipt_record(
+            vendor,
+            total,
+            tax,
+            date,
+            item_names,
+            item_costs,
+            item_quantities,
+            category,
+            additional_items_data,
+            additional_data,
+        )
+    except ValueError as e:
+        return f"receipt not stored, {e}; send total and tax as numbers and date in ISO format"
+    try:
+        return write_receipts(user_id, [receipt])[0]
+    except Exception as e:
+        print(f"  [Receipts] storing a receipt failed: {e}")
+        return "receipt not stored, the database write failed"
+
+
+@firestore.transactional
+def _delete_receipt(transaction, user_id: str, receipt_id: str) -> bool:
+    doc_ref = db.collection("users").document(user_id).collection("receipts").document(receipt_id)
+    snapshot = doc_ref.get(transaction=transaction)
+    if not snapshot.exists:
+        return False
+    receipt = snapshot.to_dict()
+    if "rollup_ids" not in receipt:
+        # naive dates are stored as UTC and come back timezone aware
+        receipt["date"] = receipt["date"].astimezone(timezone.utc).replace(tzinfo=None)
+        receipt["rollup_ids"] = _rollup_ids(receipt)
+    _stage_rollups(transaction, user_id, receipt, -1)
+    transaction.delete(doc_ref)
+    return True
 
 
 def delete_reciept_data(user_id: str, receipt_id: str) -> bool:
@@ -43,4 +221,65 @@ def delete_reciept_data(user_id: str, receipt_id: str) -> bool:
     Returns:
         bool: True if the receipt was deleted successfully, False otherwise.
     """
-    return
+    try:
+        return _delete_receipt(db.transaction(), user_id, receipt_id)
+    except Exception as e:
+        print(f"  [Receipts] deleting receipt {receipt_id} failed: {e}")
+        return False
+
+
+def _top(
+    amounts: Dict[str, float], limit: int = 3, names: Optional[Dict[str, str]] = None
+) -> Dict[str, float]:
+    """The largest amounts, keyed by their display name from names where there is one."""
+    names = names or {}
+    ranked = sorted(amounts.items(), key=lambda item: item[1], reverse=True)
+    return {
+        names.get(key, key): round(amount, 2) for key, amount in ranked[:limit] if amount > 0
+    }
+
+
+def get_spend_summary(
+    user_id: str, period: str = "month", vendor: str = "", category: str = ""
+) -> dict:
+    """
+    Gets how much a user spent, read from precomputed totals.
+    Args:
+        user_id (str): The ID of the user.
+        period (str): 'day', 'week' or 'month' for the current one, 'all' for all time.
+        vendor (str): A vendor name to get the all time spend at that vendor instead.
+        category (str): A category name to get the all time spend in that category instead.
+    Returns:
+        dict: total, number of receipts, and the top vendors and categories by spend.
+    """
+    if vendor:
+        bucket_id = f"vendor-{_key(vendor)}"
+    elif category:
+        bucket_id = f"category-{_key(category)}"
+    elif period in PERIODS:
+        bucket_id = _bucket_id(period, _utc(datetime.now()))
+    else:
+        return {"error": f"unsupported period '{period}', use one of {', '.join(PERIODS)}"}
+    rollup = _spend_ref(user_id, bucket_id).get().to_dict() or {}
+    return {
+        "period": bucket_id,
+        "total": round(rollup.get("total", 0.0), 2),
+        "count": rollup.get("count", 0),
+        "top_vendors": _top(rollup.get("vendors", {}), names=rollup.get("vendor_names")),
+        "top_categories": _top(rollup.get("categories", {})),
+    }
+
+
+def spend_for_period(user_id: str, period: str, now: datetime) -> Optional[dict]:
+    """Spend provider of the reminder templates."""
+    rollup = _spend_ref(user_id, _bucket_id(period, _utc(now))).get().to_dict()
+    if rollup is None:
+        return {"total": 0.0, "count": 0}
+    vendors = _top(rollup.get("vendors", {}), 1, rollup.get("vendor_names"))
+    spend = {"total": rollup.get("total", 0.0), "count": rollup.get("count", 0)}
+    if vendors:
+        spend["top_vendor"] = next(iter(vendors))
+    return spend
+
+
+set_spend_provider(spend_for_period)
@@ -1,11 +1,15 @@
 import json
-import requests
-from typing import Literal
+from typing import List, Literal
 from google.cloud import firestore
-from google.oauth2 import service_account
-from google.auth.transport.requests import Request
 from utility.config import configurations
 
+from agent.tools.wallet_sync import (
+    SYNC_IN_PROGRESS_OR_DONE,
+    content_hash,
+    enqueue_wallet_sync,
+    pending_sync_state,
+)
+
 # Firestore client
 db = firestore.Client()
 
@@ -13,10 +17,6 @@ db = firestore.Client()
 RECEIPT_CLASS_ID = configurations["RECEIPT_CLASS_ID"]
 REMINDER_CLASS_ID = configurations["REMINDER_CLASS_ID"]
 
-# Google Wallet scopes and service account
-GOOGLE_WALLET_SCOPES = ['https://www.googleapis.com/auth/wallet_object.issuer']
-SERVICE_ACCOUNT_FILE = 'agent/tools/service_account.json'
-
 
 def insert_pass_object_string(object_string: str, type: str) -> str:
     """
@@ -33,11 +33,44 @@ def insert_pass_object_string(object_string: str, type: str) -> str:
     doc_ref.set({
         "object": object_string,
         "type": type,
+        "content_hash": content_hash(object_string),
         "updated_at": firestore.SERVER_TIMESTAMP
     })
     return doc_ref.id
 
 
+def insert_pass_objects(object_strings: List[str], types: List[str]) -> List[str]:
+    """
+    Inserts several pass object strings into Firestore in one batch, like a receipt pass together with its reminder passes.
+
+    Args:
+        object_strings (List[str]): JSON strings of the pass objects.
+        types (List[str]): Type of each pass, either "receipt" or "reminder".
+
+    Returns:
+        List[str]: Auto-generated Firestore document IDs, in the order of the objects,
+            or a message describing why nothing was inserted.
+    """
+    if len(object_strings) != len(types):
+        return f"got {len(object_strings)} object strings but {len(types)} types, send one type per object"
+    # a Firestore batch takes at most 500 writes
+    if len(object_strings) > 500:
+        return "cannot write more than 500 passes at once"
+    batch = db.batch()
+    object_ids = []
+    for object_string, type in zip(object_strings, types):
+        doc_ref = db.collection("passes").document()
+        batch.set(doc_ref, {
+            "object": object_string,
+            "type": type,
+            "content_hash": content_hash(object_string),
+            "updated_at": firestore.SERVER_TIMESTAMP
+        })
+        object_ids.append(doc_ref.id)
+    batch.commit()
+    return object_ids
+
+
 def get_pass_object_string(pass_type: Literal["receipt", "reminder"]) -> str:
     """
     Generates a default template JSON string for a receipt or reminder pass.
@@ -81,7 +114,9 @@ def get_pass_object_string(pass_type: Literal["receipt", "reminder"]) -> str:
 
 def update_pass_object_string(object_id: str, object_dict: dict, type: str) -> dict:
     """
-    Updates a pass object in Firestore and synchronizes it with the Google Wallet API.
+    Updates a pass object in Firestore and queues its sync with the Google Wallet API.
+    The sync runs on the background job queue; its progress is kept on the
+    pass under "wallet_sync".
 
     Args:
         object_id (str): Firestore document ID of the pass to update.
@@ -89,45 +124,33 @@ def update_pass_object_string(object_id: str, object_dict: dict, type: str) -> d
         type (str): Type of pass ("receipt" or "reminder").
 
     Returns:
-        dict: Status of the operation with object ID and any error details.
+        dict: Status of the operation with object ID and the ID of the sync job,
+            or status "unchanged" when the pass already holds this object.
     """
-    # Convert to JSON string for storing in Firestore
-    object_json_str = json.dumps(object_dict, indent=2)
-
-    # Save to Firestore
-    db.collection("passes").document(object_id).set({
-        "object": object_json_str,
+    object_hash = content_hash(object_dict)
+    doc_ref = db.collection("passes").document(object_id)
+
+    # repeated agent runs often send the pass unchanged, which needs no writes at all,
+    # unless its last Wallet sync failed and sending it again is the retry
+    snapshot = doc_ref.get()
+    stored = snapshot.to_dict() or {}
+    if (
+        stored.get("content_hash") == object_hash
+        and stored.get("wallet_sync", {}).get("status") in SYNC_IN_PROGRESS_OR_DONE
+    ):
+        return {"status": "unchanged", "object_id": object_id}
+
+    # Save to Firestore, merged to keep the last synced object the Wallet diff is based on
+    doc_ref.set({
+        "object": json.dumps(object_dict, indent=2),
         "type": type,
-        "updated_at": firestore.SERVER_TIMESTAMP
-    })
-
-    # Set up credentials
-    credentials = service_account.Credentials.from_service_account_file(
-        SERVICE_ACCOUNT_FILE,
-        scopes=GOOGLE_WALLET_SCOPES
-    )
-    authed_session = Request()
-    credentials.refresh(authed_session)
-
-    headers = {
-        "Authorization": f"Bearer {credentials.token}",
-        "Content-Type": "application/json"
-    }
-
-    # Post to Google Wallet
-    response = requests.post(
-        url="https://walletobjects.googleapis.com/walletobjects/v1/genericObject",
-        headers=headers,
-        data=json.dumps(object_dict)  # now valid JSON
-    )
-
-    if response.status_code == 200:
-        return {"status": "updated_and_synced", "object_id": object_id}
-    else:
-        return {
-            "status": "firebase_updated_but_google_wallet_failed",
-            "google_error": response.text,
-            "object_id": object_id
-        }
+        "content_hash": object_hash,
+        "updated_at": firestore.SERVER_TIMESTAMP,
+        "wallet_sync": pending_sync_state(),
+    }, merge=True)
+
+    # Google Wallet is updated in the background
+    job_id = enqueue_wallet_sync(object_id)
+    return {"status": "updated_sync_queued", "object_id": object_id, "sync_job_id": job_id}
 
     
\ No newline at end of file
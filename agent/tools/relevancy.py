@@ -1,3 +1,4 @@
+from collections import OrderedDict, defaultdict
 from typing import List, Dict, Tuple
 from google.cloud import aiplatform
 import logging
@@ -10,6 +11,10 @@ logger = logging.getLogger(__name__)
 VECTOR_INDEX_ID = os.getenv("RL_VECTOR_INDEX_ID")
 ENDPOINT_ID = os.getenv("RL_ENDPOINT_ID")
 
+# contexts retrieved ahead of the agent asking for them, keyed by (user_id, query)
+PREFETCH_CACHE_SIZE = 256
+prefetched_contexts: "OrderedDict[Tuple[str, str], str]" = OrderedDict()
+
 
 def get_embeddings(texts: List[str]) -> List[List[float]]:
     """
@@ -262,6 +267,35 @@ class SimpleRAGAgent:
         print("All data cleared")
 
 
+def search_context(user_id: str, query: str) -> str:
+    """
+    Retrieves the stored data of a user that best matches the query.
+    """
+    rag = SimpleRAGAgent("data/rag_data.txt")
+    search_results = rag.simple_rag_search(query, user_id=user_id, top_k=5)
+    context = ""
+    for i, (user_id, content, score) in enumerate(search_results, 1):
+        context += content + "\n"
+    return context
+
+
+def _prefetch_key(user_id: str, query: str) -> Tuple[str, str]:
+    return user_id, " ".join(query.lower().split())
+
+
+def prefetch_context(user_id: str, query: str) -> str:
+    """
+    Retrieves context for a query before any agent asks for it and keeps it,
+    so a later 'get_relevant_context' call with the same query is answered
+    without another search.
+    """
+    context = search_context(user_id, query)
+    prefetched_contexts[_prefetch_key(user_id, query)] = context
+    while len(prefetched_contexts) > PREFETCH_CACHE_SIZE:
+        prefetched_contexts.popitem(last=False)
+    return context
+
+
 def get_relevant_context(user_id: str, query: str) -> str:
     """
     this is the 'get_relevant_context' tool
@@ -272,13 +306,10 @@ def get_relevant_context(user_id: str, query: str) -> str:
     Returns:
         str: The relevant context retrieved from the vector index.
     """
-    rag = SimpleRAGAgent("data/rag_data.txt")
-    search_results = rag.simple_rag_search("machine learning", top_k=3)
-    search_results = rag.simple_rag_search("programming", user_id="user2", top_k=5)
-    context = ""
-    for i, (user_id, content, score) in enumerate(search_results, 1):
-        context += content + "\n"
-    return context
+    context = prefetched_contexts.pop(_prefetch_key(user_id, query), None)
+    if context is not None:
+        return context
+    return search_context(user_id, query)
 
 
 def put_relevent_data(user_id: str, data: str) -> str:
@@ -1,42 +1,314 @@
-from typing import List, Optional
-from datetime import datetime
-from modals import Receipt, ReceiptItemData
+import calendar
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional
 
+from agent.templates import TEMPLATES
 
-def add_reminder_data() -> str:
+REMINDERS_DB_PATH = "data/reminders.db"
+
+REPEATS = ("none", "daily", "weekly", "monthly", "yearly")
+
+
+def next_occurrence(
+    fire_at: datetime, repeat: str, anchor_day: Optional[int] = None
+) -> Optional[datetime]:
     """
-    Adds the new receipt to the database for a user.
+    Expands a recurrence by one step.
+    Args:
+        fire_at (datetime): The current fire time.
+        repeat (str): One of REPEATS.
+        anchor_day (Optional[int]): Day of month monthly and yearly reminders
+            were first set for, by default the day of fire_at.
+    Returns:
+        Optional[datetime]: The next fire time, None for one-time reminders.
+    """
+    repeat = repeat.lower()
+    if repeat == "daily":
+        return fire_at + timedelta(days=1)
+    if repeat == "weekly":
+        return fire_at + timedelta(weeks=1)
+    if repeat in ("monthly", "yearly"):
+        months = 1 if repeat == "monthly" else 12
+        month_index = fire_at.month - 1 + months
+        year, month = fire_at.year + month_index // 12, month_index % 12 + 1
+        # the 31st fires on the last day of shorter months, and on the 31st again after them
+        day = min(anchor_day or fire_at.day, calendar.monthrange(year, month)[1])
+        return fire_at.replace(year=year, month=month, day=day)
+    return None
+
+
+class ReminderStore:
+    """
+    Persistent reminders indexed on their next fire time, so due reminders
+    are found without reading every reminder of every user.
+    """
+
+    def __init__(self, db_path: str = REMINDERS_DB_PATH):
+        self.lock = threading.Lock()
+        self.listeners: List[Callable[[str, Optional[float]], None]] = []
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS reminders (
+                id TEXT PRIMARY KEY,
+                user_id TEXT NOT NULL,
+                title TEXT NOT NULL,
+                message TEXT NOT NULL DEFAULT '',
+                repeat TEXT NOT NULL DEFAULT 'none',
+                template TEXT NOT NULL DEFAULT '',
+                next_fire_at REAL,
+                anchor_day INTEGER,
+                created_at REAL NOT NULL
+            )
+            """
+        )
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(reminders)")}
+        if "template" not in columns:
+            self.conn.execute("ALTER TABLE reminders ADD COLUMN template TEXT NOT NULL DEFAULT ''")
+        if "anchor_day" not in columns:
+            self.conn.execute("ALTER TABLE reminders ADD COLUMN anchor_day INTEGER")
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS reminders_due ON reminders (next_fire_at)"
+        )
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS reminders_user ON reminders (user_id, next_fire_at)"
+        )
+        self.conn.commit()
+
+    def _notify(self, reminder_id: str, next_fire_at: Optional[float]):
+        for listener in self.listeners:
+            listener(reminder_id, next_fire_at)
+
+    def add(
+        self,
+        user_id: str,
+        title: str,
+        fire_at: datetime,
+        repeat: str = "none",
+        message: str = "",
+        template: str = "",
+    ) -> str:
+        reminder_id = uuid.uuid4().hex
+        next_fire_at = fire_at.timestamp()
+        with self.lock:
+            self.conn.execute(
+                "INSERT INTO reminders"
+                " (id, user_id, title, message, repeat, template, next_fire_at, anchor_day, created_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    reminder_id,
+                    user_id,
+                    title,
+                    message,
+                    repeat.lower(),
+                    template,
+                    next_fire_at,
+                    fire_at.day,
+                    time.time(),
+                ),
+            )
+            self.conn.commit()
+        self._notify(reminder_id, next_fire_at)
+        return reminder_id
+
+    def get(self, reminder_id: str) -> Optional[dict]:
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT * FROM reminders WHERE id = ?", (reminder_id,)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def update(self, user_id: str, reminder_id: str, **fields) -> bool:
+        """Updates title, message, repeat, template or fire_at of a reminder owned by user_id."""
+        columns = {key: value for key, value in fields.items() if value is not None}
+        if "fire_at" in columns:
+            fire_at = columns.pop("fire_at")
+            columns["next_fire_at"] = fire_at.timestamp()
+            columns["anchor_day"] = fire_at.day
+        if "repeat" in columns:
+            columns["repeat"] = columns["repeat"].lower()
+        if not columns:
+            return False
+        assignments = ", ".join(f"{column} = ?" for column in columns)
+        with self.lock:
+            cursor = self.conn.execute(
+                f"UPDATE reminders SET {assignments} WHERE id = ? AND user_id = ?",
+                (*columns.values(), reminder_id, user_id),
+            )
+            self.conn.commit()
+        if cursor.rowcount and "next_fire_at" in columns:
+            self._notify(reminder_id, columns["next_fire_at"])
+        return cursor.rowcount > 0
+
+    def delete(self, user_id: str, reminder_id: str) -> bool:
+        with self.lock:
+            cursor = self.conn.execute(
+                "DELETE FROM reminders WHERE id = ? AND user_id = ?", (reminder_id, user_id)
+            )
+            self.conn.commit()
+        if cursor.rowcount:
+            self._notify(reminder_id, None)
+        return cursor.rowcount > 0
+
+    def due(self, now: float, user_id: Optional[str] = None) -> List[dict]:
+        """Reminders whose next fire time has passed, optionally of one user."""
+        query = "SELECT * FROM reminders WHERE next_fire_at <= ?"
+        params: tuple = (now,)
+        if user_id is not None:
+            query += " AND user_id = ?"
+            params += (user_id,)
+        with self.lock:
+            rows = self.conn.execute(query + " ORDER BY next_fire_at", params).fetchall()
+        return [dict(row) for row in rows]
+
+    def upcoming(self, limit: int = 1000) -> List[tuple]:
+        """(next_fire_at, id) of the earliest scheduled reminders."""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT next_fire_at, id FROM reminders WHERE next_fire_at IS NOT NULL"
+                " ORDER BY next_fire_at LIMIT ?",
+                (limit,),
+            ).fetchall()
+        # plain tuples, sqlite3.Row does not order, so it cannot go in a heap
+        return [(row[0], row[1]) for row in rows]
+
+    def users_due(self, now: float, after: str = "", limit: int = 1000) -> List[str]:
+        """IDs of users with due reminders in order, for paging through all users."""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT DISTINCT user_id FROM reminders WHERE next_fire_at <= ?"
+                " AND user_id > ? ORDER BY user_id LIMIT ?",
+                (now, after, limit),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def count_users_due(self, now: float) -> int:
+        with self.lock:
+            return self.conn.execute(
+                "SELECT COUNT(DISTINCT user_id) FROM reminders WHERE next_fire_at <= ?",
+                (now,),
+            ).fetchone()[0]
+
+    def advance(self, reminder: dict, now: float) -> bool:
+        """
+        Claims a due reminder by moving it to its next occurrence after `now`,
+        skipping the occurrences that were missed. One-time reminders are
+        unscheduled. The move only applies while the reminder is still at the
+        fire time it was read with, so of the scheduler and a bulk run
+        advancing the same reminder exactly one succeeds, and only that one
+        delivers it.
+        Returns:
+            bool: True if this call claimed the reminder.
+        """
+        fire_at = datetime.fromtimestamp(reminder["next_fire_at"])
+        while fire_at is not None and fire_at.timestamp() <= now:
+            fire_at = next_occurrence(fire_at, reminder["repeat"], reminder.get("anchor_day"))
+        next_fire_at = fire_at.timestamp() if fire_at else None
+        with self.lock:
+            cursor = self.conn.execute(
+                "UPDATE reminders SET next_fire_at = ? WHERE id = ? AND next_fire_at = ?",
+                (next_fire_at, reminder["id"], reminder["next_fire_at"]),
+            )
+            self.conn.commit()
+        if not cursor.rowcount:
+            return False
+        self._notify(reminder["id"], next_fire_at)
+        return True
+
+
+reminder_store = ReminderStore()
+
+
+def _parse_date(date_and_time: str) -> datetime:
+    return datetime.fromisoformat(date_and_time.strip().replace("Z", ""))
+
+
+def add_reminder_data(
+    user_id: str,
+    title: str,
+    date_and_time: str,
+    repeat: str = "None",
+    message: str = "",
+    template: str = "",
+) -> str:
+    """
+    Adds a new reminder for a user.
     Args:
         user_id (str): The ID of the user.
-        vendor (str): The vendor of the receipt, if not provided, it will be set to "Unknown".
-        total (str): The total amount of the receipt.
-        tax (float): The tax amount of the receipt, if no tax set to 0
-        date (Optional[datetime]): The date of the receipt.
-        item_names (List[ReceiptItem]): List of items in the receipt.
-        item_costs (List[float]): List of costs for each item.
-        item_quantities (List[int]): List of quantities for each item.
-        additional_items_data (Optional[str]): Additional data for the items, default is "{}".
-        additional_data (Optional[str]): Additional data for the receipt, default is "{}".
+        title (str): A short title describing the reminder purpose, like 'Buy groceries'.
+        date_and_time (str): When the reminder should first fire, in ISO format (YYYY-MM-DDTHH:MM:SS).
+        repeat (str): How often it repeats: 'None', 'Daily', 'Weekly', 'Monthly' or 'Yearly'.
+        message (str): The text to remind the user with, empty to use the title.
+        template (str): For spending summaries, one of 'daily_expense_total',
+            'weekly_expense_total' or 'monthly_expense_total'; empty otherwise.
     Returns:
-        str: The ID of the created receipt.
+        str: The ID of the created reminder, or a message describing why it was not created.
     """
-    return
+    if repeat.lower() not in REPEATS:
+        return f"unsupported repeat '{repeat}', use one of {', '.join(REPEATS)}"
+    if template and template not in TEMPLATES:
+        return f"unsupported template '{template}', use one of {', '.join(TEMPLATES)}"
+    try:
+        fire_at = _parse_date(date_and_time)
+    except ValueError:
+        return f"unsupported date '{date_and_time}', use ISO format (YYYY-MM-DDTHH:MM:SS)"
+    return reminder_store.add(user_id, title, fire_at, repeat, message, template)
 
 
 def update_reminder_data(
     user_id: str,
-):
-
-    return
+    reminder_id: str,
+    title: Optional[str] = None,
+    date_and_time: Optional[str] = None,
+    repeat: Optional[str] = None,
+    message: Optional[str] = None,
+    template: Optional[str] = None,
+) -> bool:
+    """
+    Updates a reminder of a user; only the given fields change.
+    Args:
+        user_id (str): The ID of the user.
+        reminder_id (str): The ID of the reminder to update.
+        title (Optional[str]): The new title.
+        date_and_time (Optional[str]): The new next fire time, in ISO format.
+        repeat (Optional[str]): The new repetition: 'None', 'Daily', 'Weekly', 'Monthly' or 'Yearly'.
+        message (Optional[str]): The new reminder text.
+        template (Optional[str]): The new spending summary template, empty to remove it.
+    Returns:
+        bool: True if the reminder was updated, False otherwise.
+    """
+    if repeat is not None and repeat.lower() not in REPEATS:
+        return False
+    if template and template not in TEMPLATES:
+        return False
+    try:
+        fire_at = _parse_date(date_and_time) if date_and_time else None
+    except ValueError:
+        return False
+    return reminder_store.update(
+        user_id,
+        reminder_id,
+        title=title,
+        fire_at=fire_at,
+        repeat=repeat,
+        message=message,
+        template=template,
+    )
 
 
-def delete_remainder_data(user_id: str, receipt_id: str) -> bool:
+def delete_remainder_data(user_id: str, reminder_id: str) -> bool:
     """
-    Deletes a receipt for a user.
+    Deletes a reminder for a user.
     Args:
         user_id (str): The ID of the user.
-        receipt_id (str): The ID of the receipt to be deleted.
+        reminder_id (str): The ID of the reminder to be deleted.
     Returns:
-        bool: True if the receipt was deleted successfully, False otherwise.
+        bool: True if the reminder was deleted successfully, False otherwise.
     """
-    return
+    return reminder_store.delete(user_id, reminder_id)
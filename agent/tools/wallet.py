@@ -0,0 +1,145 @@
+import asyncio
+import json
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Optional
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from google.oauth2 import service_account
+from google.auth.transport.requests import Request
+
+# Google Wallet scopes and service account
+GOOGLE_WALLET_SCOPES = ['https://www.googleapis.com/auth/wallet_object.issuer']
+SERVICE_ACCOUNT_FILE = 'agent/tools/service_account.json'
+
+WALLET_OBJECT_URL = "https://walletobjects.googleapis.com/walletobjects/v1/genericObject"
+
+# tokens are refreshed this long before they expire, so no request races the expiry
+TOKEN_REFRESH_MARGIN = timedelta(minutes=5)
+
+# keep-alive connections held open to the Wallet API
+WALLET_POOL_SIZE = 20
+
+
+class ServiceAccountTokenProvider:
+    """
+    OAuth access tokens of the Wallet service account. The key file is read
+    on first use and the token is reused until TOKEN_REFRESH_MARGIN before it
+    expires.
+    """
+
+    def __init__(
+        self,
+        service_account_file: str = SERVICE_ACCOUNT_FILE,
+        scopes=GOOGLE_WALLET_SCOPES,
+        refresh_margin: timedelta = TOKEN_REFRESH_MARGIN,
+    ):
+        self.service_account_file = service_account_file
+        self.scopes = scopes
+        self.refresh_margin = refresh_margin
+        self.credentials = None
+        self.lock = threading.Lock()
+
+    def cached_token(self) -> Optional[str]:
+        """The current token, None if it has to be refreshed first."""
+        credentials = self.credentials
+        if credentials is None or credentials.token is None:
+            return None
+        # google-auth keeps expiry as a naive UTC datetime
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        if credentials.expiry and credentials.expiry - self.refresh_margin <= now:
+            return None
+        return credentials.token
+
+    def __call__(self) -> str:
+        token = self.cached_token()
+        if token is not None:
+            return token
+        with self.lock:
+            token = self.cached_token()
+            if token is None:
+                if self.credentials is None:
+                    self.credentials = service_account.Credentials.from_service_account_file(
+                        self.service_account_file, scopes=self.scopes
+                    )
+                self.credentials.refresh(Request())
+                token = self.credentials.token
+        return token
+
+
+class WalletClient:
+    """
+    Google Wallet generic object client over pooled keep-alive connections,
+    with a blocking session for the sync tools and an httpx client for the
+    async ones.
+    Args:
+        token_provider: Callable returning a bearer token, by default the
+            cached service account token.
+        object_url (str): The genericObject endpoint.
+    """
+
+    def __init__(
+        self,
+        token_provider: Optional[Callable[[], str]] = None,
+        object_url: str = WALLET_OBJECT_URL,
+        pool_size: int = WALLET_POOL_SIZE,
+        timeout: float = 30.0,
+    ):
+        self.token_provider = token_provider or ServiceAccountTokenProvider()
+        self.object_url = object_url
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.pool_size = pool_size
+        self._http_client = None
+
+    @property
+    def http_client(self) -> httpx.AsyncClient:
+        # created on first use, inside the event loop that serves it
+        if self._http_client is None:
+            self._http_client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(max_keepalive_connections=self.pool_size),
+            )
+        return self._http_client
+
+    def _headers(self, token: str) -> dict:
+        return {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
+
+    async def _token_async(self) -> str:
+        cached_token = getattr(self.token_provider, "cached_token", None)
+        token = cached_token() if cached_token else None
+        # a refresh is a blocking HTTP call, keep it off the event loop
+        return token or await asyncio.to_thread(self.token_provider)
+
+    def post_object(self, object_dict: dict) -> requests.Response:
+        """Sends a generic pass object to Google Wallet."""
+        return self.session.post(
+            self.object_url,
+            headers=self._headers(self.token_provider()),
+            data=json.dumps(object_dict),
+            timeout=self.timeout,
+        )
+
+    async def post_object_async(self, object_dict: dict) -> httpx.Response:
+        """Sends a generic pass object to Google Wallet without blocking the event loop."""
+        return await self.http_client.post(
+            self.object_url,
+            headers=self._headers(await self._token_async()),
+            content=json.dumps(object_dict),
+        )
+
+    async def patch_object_async(self, wallet_object_id: str, fields: dict) -> httpx.Response:
+        """Updates only the given fields of a generic pass object without blocking the event loop."""
+        return await self.http_client.patch(
+            f"{self.object_url}/{wallet_object_id}",
+            headers=self._headers(await self._token_async()),
+            content=json.dumps(fields),
+        )
+
+
+wallet_client = WalletClient()
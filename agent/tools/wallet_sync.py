@@ -0,0 +1,127 @@
+import hashlib
+import json
+from typing import Union
+from google.cloud import firestore
+
+from agent.jobs import job_queue
+from agent.tools.wallet import wallet_client
+
+# Async Firestore client, created on first use so it binds to the running event loop
+_db = None
+
+
+def get_db() -> firestore.AsyncClient:
+    global _db
+    if _db is None:
+        _db = firestore.AsyncClient()
+    return _db
+
+
+WALLET_SYNC_JOB = "wallet_sync"
+
+# sync states kept on each pass document under "wallet_sync"
+SYNC_PENDING = "pending"
+SYNC_RETRYING = "retrying"
+SYNC_SYNCED = "synced"
+SYNC_REJECTED = "rejected"
+SYNC_FAILED = "failed"
+
+# an unchanged pass in one of these states needs no new sync
+SYNC_IN_PROGRESS_OR_DONE = (SYNC_PENDING, SYNC_RETRYING, SYNC_SYNCED)
+
+# Wallet API responses worth retrying, anything else will not succeed on a retry either
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+class WalletSyncError(Exception):
+    pass
+
+
+def content_hash(pass_object: Union[dict, str]) -> str:
+    """Hash of a pass object that ignores key order and JSON formatting."""
+    if isinstance(pass_object, str):
+        try:
+            pass_object = json.loads(pass_object)
+        except ValueError:
+            return hashlib.sha256(pass_object.encode("utf-8")).hexdigest()
+    canonical = json.dumps(pass_object, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def object_diff(old: dict, new: dict) -> dict:
+    """Top level fields of new that differ from old; removed fields are set to None."""
+    fields = {key: value for key, value in new.items() if old.get(key) != value}
+    fields.update({key: None for key in old if key not in new})
+    return fields
+
+
+def pending_sync_state() -> dict:
+    """The sync state written together with a pass update."""
+    return {"status": SYNC_PENDING, "error": None, "updated_at": firestore.SERVER_TIMESTAMP}
+
+
+def enqueue_wallet_sync(object_id: str) -> str:
+    """
+    Queues a push of a pass to Google Wallet. The worker sends the pass as
+    stored in Firestore when it runs, so updates to the same pass made while
+    the push is pending coalesce into one.
+    Args:
+        object_id (str): Firestore document ID of the pass.
+    Returns:
+        str: The ID of the sync job.
+    """
+    return job_queue.enqueue(WALLET_SYNC_JOB, {"object_id": object_id}, dedupe_key=object_id)
+
+
+async def _set_sync_state(doc_ref, status: str, error: str = None, synced_object: str = None):
+    state = {"status": status, "error": error, "updated_at": firestore.SERVER_TIMESTAMP}
+    fields = {"wallet_sync": state}
+    if status == SYNC_SYNCED:
+        state["synced_at"] = firestore.SERVER_TIMESTAMP
+        # what Google Wallet holds now, the base of the next diff
+        fields["wallet_synced_object"] = synced_object
+    await doc_ref.set(fields, merge=True)
+
+
+async def sync_pass(payload: dict) -> dict:
+    """
+    Job handler pushing the stored pass to Google Wallet. A pass Google
+    Wallet already has is sent as a PATCH of the fields changed since its
+    last sync, a new one is sent whole. Inserted passes are not pushed to
+    Google Wallet, so they have no wallet_synced_object and their first
+    sync is always a full POST.
+    """
+    doc_ref = get_db().collection("passes").document(payload["object_id"])
+    snapshot = await doc_ref.get()
+    if not snapshot.exists:
+        return {"status": "deleted", "object_id": payload["object_id"]}
+    stored = snapshot.to_dict()
+    object_dict = json.loads(stored["object"])
+    synced_object = stored.get("wallet_synced_object")
+
+    response = None
+    if synced_object and "id" in object_dict:
+        fields = object_diff(json.loads(synced_object), object_dict)
+        if not fields:
+            await _set_sync_state(doc_ref, SYNC_SYNCED, synced_object=stored["object"])
+            return {"status": SYNC_SYNCED, "object_id": payload["object_id"]}
+        response = await wallet_client.patch_object_async(object_dict["id"], fields)
+    # objects missing from Google Wallet are inserted whole
+    if response is None or response.status_code == 404:
+        response = await wallet_client.post_object_async(object_dict)
+
+    if response.status_code == 200:
+        await _set_sync_state(doc_ref, SYNC_SYNCED, synced_object=stored["object"])
+        return {"status": SYNC_SYNCED, "object_id": payload["object_id"]}
+    if response.status_code in RETRYABLE_STATUS_CODES:
+        await _set_sync_state(doc_ref, SYNC_RETRYING, response.text[:500])
+        raise WalletSyncError(f"Google Wallet returned {response.status_code}")
+    await _set_sync_state(doc_ref, SYNC_REJECTED, response.text[:500])
+    return {"status": SYNC_REJECTED, "object_id": payload["object_id"]}
+
+
+async def sync_pass_failed(payload: dict, error: str):
+    await _set_sync_state(get_db().collection("passes").document(payload["object_id"]), SYNC_FAILED, error)
+
+
+job_queue.register(WALLET_SYNC_JOB, sync_pass, on_failure=sync_pass_failed)
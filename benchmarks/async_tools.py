@@ -0,0 +1,52 @@
+"""
+Compares concurrent agent-session throughput of the blocking and the async tools.
+
+Each simulated session makes the same tool calls the bargain agents make
+during one turn. Blocking tools are awaited from inside the event loop, the
+way ADK invokes sync tools, so they serialize every session behind I/O.
+
+Run against the Firestore emulator:
+    FIRESTORE_EMULATOR_HOST=localhost:8080 python -m benchmarks.async_tools --sessions 50
+"""
+
+import argparse
+import asyncio
+import time
+
+from agent.tools import async_bargain
+from agent.tools import bargain
+
+
+async def sync_session(user_id: str, calls: int):
+    for _ in range(calls):
+        bargain.get_balance(user_id)
+        bargain.get_inventory(user_id, ["item"], 1)
+
+
+async def async_session(user_id: str, calls: int):
+    for _ in range(calls):
+        await async_bargain.get_balance(user_id)
+        await async_bargain.get_inventory(user_id, ["item"], 1)
+
+
+async def measure(session, sessions: int, calls: int) -> float:
+    start = time.perf_counter()
+    await asyncio.gather(*(session(f"bench{i}", calls) for i in range(sessions)))
+    return time.perf_counter() - start
+
+
+async def main(sessions: int, calls: int):
+    for name, session in (("sync", sync_session), ("async", async_session)):
+        elapsed = await measure(session, sessions, calls)
+        print(
+            f"{name:>5}: {sessions} sessions x {calls} turns in {elapsed:.2f}s "
+            f"({sessions / elapsed:.1f} sessions/s)"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--calls", type=int, default=3)
+    args = parser.parse_args()
+    asyncio.run(main(args.sessions, args.calls))
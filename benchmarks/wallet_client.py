@@ -0,0 +1,135 @@
+"""
+Measures per-sync latency of Wallet pushes against a local stub of the API
+and of Google's OAuth token endpoint.
+
+"per-call" repeats what update_pass_object_string used to do for every sync:
+a token refresh, a POST to the token endpoint on a new connection, and a
+one-off requests.post of the pass. "client" goes through WalletClient and
+ServiceAccountTokenProvider, which refresh the token only when it is about to
+expire and reuse a pooled keep-alive session.
+
+Both go to 127.0.0.1, so the numbers only show the relative cost of the two
+paths on this machine. --token-delay-ms adds a delay to every token response,
+e.g. a round trip to oauth2.googleapis.com measured from the deployment.
+
+    python -m benchmarks.wallet_client --syncs 200 --token-delay-ms 0
+"""
+
+import argparse
+import json
+import statistics
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from agent.tools.wallet import ServiceAccountTokenProvider, WalletClient
+
+PASS_OBJECT = {"id": "issuer.bench", "classId": "issuer.receipt", "state": "ACTIVE"}
+
+TOKEN_LIFETIME_SECONDS = 3600
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    token_delay = 0.0
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.path == "/token":
+            time.sleep(self.token_delay)
+            body = {"access_token": "token", "expires_in": TOKEN_LIFETIME_SECONDS, "token_type": "Bearer"}
+        else:
+            body = {"id": "issuer.bench"}
+        payload = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubCredentials:
+    """
+    Stands in for service account credentials: refresh() posts a JWT bearer
+    grant to the stub token endpoint and keeps the expiry as google-auth does.
+    """
+
+    def __init__(self, token_url: str):
+        self.token_url = token_url
+        self.token = None
+        self.expiry = None
+
+    def refresh(self, request=None):
+        response = requests.post(
+            self.token_url,
+            data={"grant_type": "urn:ietf:params:oauth:grant-type:jwt-bearer", "assertion": "jwt"},
+        )
+        grant = response.json()
+        self.token = grant["access_token"]
+        self.expiry = datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(
+            seconds=grant["expires_in"]
+        )
+
+
+def start_stub_server(token_delay: float) -> ThreadingHTTPServer:
+    StubHandler.token_delay = token_delay
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def per_call_sync(object_url: str, token_url: str):
+    credentials = StubCredentials(token_url)
+    credentials.refresh()
+    requests.post(
+        object_url,
+        headers={"Authorization": f"Bearer {credentials.token}", "Content-Type": "application/json"},
+        data=json.dumps(PASS_OBJECT),
+    )
+
+
+def measure(sync, syncs: int) -> list:
+    latencies = []
+    for _ in range(syncs):
+        start = time.perf_counter()
+        sync()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def report(name: str, latencies: list):
+    ordered = sorted(latencies)
+    print(
+        f"{name:>8}: mean {statistics.mean(ordered):.2f}ms  "
+        f"p50 {ordered[len(ordered) // 2]:.2f}ms  "
+        f"p95 {ordered[int(len(ordered) * 0.95) - 1]:.2f}ms"
+    )
+
+
+def main(syncs: int, token_delay_ms: float):
+    server = start_stub_server(token_delay_ms / 1000)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    object_url = f"{base_url}/walletobjects/v1/genericObject"
+    token_url = f"{base_url}/token"
+
+    token_provider = ServiceAccountTokenProvider()
+    token_provider.credentials = StubCredentials(token_url)
+    client = WalletClient(token_provider=token_provider, object_url=object_url)
+
+    report("per-call", measure(lambda: per_call_sync(object_url, token_url), syncs))
+    report("client", measure(lambda: client.post_object(PASS_OBJECT), syncs))
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--syncs", type=int, default=200)
+    parser.add_argument("--token-delay-ms", type=float, default=0.0)
+    args = parser.parse_args()
+    main(args.syncs, args.token_delay_ms)
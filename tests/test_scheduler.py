@@ -0,0 +1,95 @@
+import asyncio
+import time
+from datetime import datetime
+
+import pytest
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    # agent.tools.reminder opens data/reminders.db when it is imported
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "data").mkdir()
+    from agent.tools.reminder import ReminderStore
+
+    return ReminderStore(str(tmp_path / "data" / "test_reminders.db"))
+
+
+def test_upcoming_returns_orderable_tuples(store):
+    now = time.time()
+    store.add("user", "later", datetime.fromtimestamp(now + 60))
+    store.add("user", "sooner", datetime.fromtimestamp(now + 30))
+    upcoming = store.upcoming()
+    assert all(type(entry) is tuple for entry in upcoming)
+    assert upcoming == sorted(upcoming)
+
+
+def test_scheduler_fires_reminders_stored_before_start(store):
+    from agent.scheduler import ReminderScheduler
+
+    now = time.time()
+    first = store.add("user", "first", datetime.fromtimestamp(now - 2))
+    second = store.add("user", "second", datetime.fromtimestamp(now - 1))
+    store.add("user", "future", datetime.fromtimestamp(now + 3600))
+    delivered = []
+
+    async def deliver(reminder):
+        delivered.append(reminder["id"])
+
+    async def run():
+        scheduler = ReminderScheduler(deliver, store)
+        task = asyncio.create_task(scheduler.run())
+        for _ in range(100):
+            if len(delivered) == 2:
+                break
+            await asyncio.sleep(0.01)
+        assert not task.done(), task.exception()
+        # a reminder added while the dispatcher runs goes through _push
+        store.add("user", "added", datetime.fromtimestamp(time.time() + 1800))
+        await asyncio.sleep(0.01)
+        assert not task.done(), task.exception()
+        task.cancel()
+
+    asyncio.run(run())
+    assert delivered == [first, second]
+    assert store.get(first)["next_fire_at"] is None
+
+
+def test_scheduler_refills_past_the_loaded_horizon(store, monkeypatch):
+    import agent.scheduler
+    from agent.scheduler import ReminderScheduler
+
+    monkeypatch.setattr(agent.scheduler, "HEAP_REFILL_SIZE", 2)
+    now = time.time()
+    for title, offset in (("a", 0.05), ("b", 0.1), ("c", 0.15)):
+        store.add("user", title, datetime.fromtimestamp(now + offset))
+    delivered = []
+
+    async def deliver(reminder):
+        delivered.append(reminder["title"])
+
+    async def run():
+        scheduler = ReminderScheduler(deliver, store)
+        task = asyncio.create_task(scheduler.run())
+        await asyncio.sleep(0)
+        # only a and b are loaded; this push keeps the heap from running dry
+        store.add("user", "far", datetime.fromtimestamp(now + 3600))
+        for _ in range(100):
+            if len(delivered) == 3:
+                break
+            await asyncio.sleep(0.01)
+        task.cancel()
+
+    asyncio.run(run())
+    assert delivered == ["a", "b", "c"]
+
+
+def test_monthly_reminders_keep_their_day_after_short_months(store):
+    fire_at = datetime(2026, 1, 31, 9, 0)
+    reminder_id = store.add("user", "rent", fire_at, "monthly")
+    fired = []
+    for _ in range(3):
+        reminder = store.get(reminder_id)
+        fired.append(datetime.fromtimestamp(reminder["next_fire_at"]))
+        assert store.advance(reminder, reminder["next_fire_at"])
+    assert [date.day for date in fired] == [31, 28, 31]